@@ -0,0 +1,187 @@
+import gzip
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressed output files. Text is cut in blocks at write() boundaries and every block is
+# compressed on its own, by a pool of background threads, into one gzip member or zstd frame.
+# Members are written in order, so the file is a normal multi-member archive that zcat / zstdcat
+# read as a whole, and the sidecar index of member offsets lets readers start at any member.
+
+# Uncompressed bytes in one member
+BLOCK_SIZE = 4 * 1024 * 1024
+
+COMPRESSIONS = ["gzip", "zstd"]
+EXTENSIONS = { "gzip": ".gz", "zstd": ".zst" }
+DEFAULT_LEVELS = { "gzip": 6, "zstd": 3 }
+INDEX_EXTENSION = ".index"
+
+def compression_threads(processes=1):
+    # Threads compressing blocks in every one of processes compressing at once, together they
+    # get one thread for every CPU
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+# Thread pools of the current process by number of threads, made again after a fork as threads do not survive it
+executor_owner = None
+executors = {}
+
+def get_executor(threads):
+    global executor_owner
+    if executor_owner != os.getpid():
+        executors.clear()
+        executor_owner = os.getpid()
+    if threads not in executors:
+        executors[threads] = ThreadPoolExecutor(threads)
+    return executors[threads]
+
+def compress_block(compression, level, block):
+    if compression == "gzip":
+        # mtime=0 keeps the output of the same data the same
+        return gzip.compress(block, level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(block)
+
+def check_compression(compression):
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown compression " + str(compression) + ", expected one of " + ", ".join(COMPRESSIONS))
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression needs the zstandard package: pip install zstandard")
+
+def compressed_file_name(path, compression):
+    extension = EXTENSIONS[compression]
+    return path if path.endswith(extension) else path + extension
+
+class CompressedOutputFile:
+    # Text file whose blocks are compressed in the background while the caller keeps writing
+
+    def __init__(self, path, compression="gzip", level=None, block_size=BLOCK_SIZE, threads=None):
+        check_compression(compression)
+        threads = threads or compression_threads()
+
+        self.path = path
+        self.file = open(path, 'wb')
+        self.compression = compression
+        self.level = level if level is not None else DEFAULT_LEVELS[compression]
+        self.block_size = block_size
+        self.executor = get_executor(threads)
+        self.max_pending = 2 * threads
+
+        self.block = []
+        self.block_length = 0
+        self.pending = []
+
+        # (compressed size, uncompressed size) of every member written
+        self.members = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.block.append(data)
+        self.block_length += len(data)
+
+        if self.block_length >= self.block_size:
+            self.submit_block()
+
+    def submit_block(self):
+        if not self.block_length:
+            return
+
+        block = b"".join(self.block)
+        self.block = []
+        self.block_length = 0
+        self.pending.append((self.executor.submit(compress_block, self.compression, self.level, block), len(block)))
+
+        # Bounded number of blocks in memory, the oldest one is written once it is compressed
+        while len(self.pending) > self.max_pending:
+            self.write_member()
+
+    def write_member(self):
+        future, uncompressed_size = self.pending.pop(0)
+        member = future.result()
+        self.file.write(member)
+        self.members.append((len(member), uncompressed_size))
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        self.submit_block()
+        while self.pending:
+            self.write_member()
+        self.file.close()
+        write_index(self.path, self.compression, self.members)
+
+def write_index(path, compression, members):
+    # Offsets of every member in the compressed file and in the uncompressed text
+    compressed_offset = 0
+    uncompressed_offset = 0
+    offsets = []
+    for compressed_size, uncompressed_size in members:
+        offsets.append([compressed_offset, uncompressed_offset])
+        compressed_offset += compressed_size
+        uncompressed_offset += uncompressed_size
+
+    with open(path + INDEX_EXTENSION, 'w', encoding="utf-8") as index_file:
+        json.dump({ "compression": compression, "members": offsets, "compressed_size": compressed_offset, "uncompressed_size": uncompressed_offset }, index_file)
+
+def read_index(path):
+    with open(path + INDEX_EXTENSION, 'r', encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+def member_sizes(path):
+    # (compressed size, uncompressed size) of every member, read back from the index of path
+    index = read_index(path)
+    ends = index["members"][1:] + [[index["compressed_size"], index["uncompressed_size"]]]
+    return [(end[0] - start[0], end[1] - start[1]) for start, end in zip(index["members"], ends)]
+
+def join_compressed_files(paths, output_path, compression):
+    # Concatenate compressed files into one archive, members are copied without decompressing them
+    members = []
+    with open(output_path, 'wb') as output:
+        for path in paths:
+            with open(path, 'rb') as part:
+                while True:
+                    data = part.read(1024 * 1024)
+                    if not data:
+                        break
+                    output.write(data)
+            members += member_sizes(path)
+    write_index(output_path, compression, members)
+
+def read_range(path, uncompressed_offset, length):
+    # length bytes of the uncompressed text of path from uncompressed_offset on,
+    # only the members holding them are read and decompressed
+    index = read_index(path)
+    number_of_members = len(index["members"])
+    if not number_of_members:
+        return b""
+    offsets = index["members"] + [[index["compressed_size"], index["uncompressed_size"]]]
+
+    first = 0
+    while first + 1 < number_of_members and offsets[first + 1][1] <= uncompressed_offset:
+        first += 1
+    last = first
+    while last + 1 < number_of_members and offsets[last + 1][1] < uncompressed_offset + length:
+        last += 1
+
+    with open(path, 'rb') as archive:
+        archive.seek(offsets[first][0])
+        data = archive.read(offsets[last + 1][0] - offsets[first][0])
+
+    if index["compression"] == "gzip":
+        text = gzip.decompress(data)
+    else:
+        text = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+
+    start = uncompressed_offset - offsets[first][1]
+    return text[start:start + length]
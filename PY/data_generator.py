@@ -1,6 +1,8 @@
 import random
 import string
 from datetime import date, timedelta
+from id_allocator import UniqueIdAllocator
+from time_sampler import UNIFORM_HOURS_CUMULATIVE, format_date, sample_date, sample_timestamps
 
 # Dictionary of currency code and symbol
 currencies = {
@@ -121,23 +123,65 @@ postcodes = [
     "190013", "190014", "190015", "190016", "190017", "190018", "190019", "190020", "190021","190022"
 ]
 
-generated_sorts = []
+SORT_CODE_LENGTH = 6
+REFERENCE_NUMBER_DIGITS = 9
+REFERENCE_NUMBER_LETTERS = 3
+
+def format_reference_number(value):
+    numeric_part, letter_value = divmod(value, 26 ** REFERENCE_NUMBER_LETTERS)
+    letter_part = ""
+    for _ in range(REFERENCE_NUMBER_LETTERS):
+        letter_value, letter = divmod(letter_value, 26)
+        letter_part = string.ascii_lowercase[letter] + letter_part
+    return str(numeric_part).zfill(REFERENCE_NUMBER_DIGITS) + letter_part
+
+class IdentifierGenerator:
+    # Identifiers that have to be unique in one dataset. Every dataset gets its
+    # own generator, the same seed gives the same identifiers.
+
+    def __init__(self, seed=None):
+        seed_source = random.Random(seed)
+
+        # Every sort code is handed out once, in random order
+        self.sort_codes = UniqueIdAllocator(10 ** SORT_CODE_LENGTH, seed_source.getrandbits(64))
+
+        # Reference number is 9 digits followed by 3 lowercase letters, every one is handed out once
+        self.reference_numbers = UniqueIdAllocator(10 ** REFERENCE_NUMBER_DIGITS * 26 ** REFERENCE_NUMBER_LETTERS, seed_source.getrandbits(64))
+
+        self.swift_counter = -1
+
+    def generate_sort(self):
+        return str(self.sort_codes.allocate()).zfill(SORT_CODE_LENGTH)
+
+    def generate_swift(self):
+        self.swift_counter += 1
+        if (self.swift_counter < 10):
+            return 'LSTNGS0' + str(self.swift_counter)
+        return 'LSTNGS' + str(self.swift_counter)
+
+    def generate_reference_number(self):
+        return format_reference_number(self.reference_numbers.allocate())
+
+    # Reference number returned by the index-th call of generate_reference_number()
+    def get_reference_number(self, index):
+        return format_reference_number(self.reference_numbers.at(index))
+
+    def check_capacity(self, number_of_banks, number_of_customers):
+        # Fail before generation starts rather than in the middle of it
+        self.sort_codes.check_capacity(number_of_banks, "sort codes")
+        self.reference_numbers.check_capacity(number_of_customers, "reference numbers")
+
+# Identifiers of the functions below, for scripts that generate one dataset
+default_identifiers = IdentifierGenerator()
+
 def generate_sort():
-    result = ""
-    while result == "":
-        result = ''.join(random.choice(string.digits) for _ in range(6))
-        if result in generated_sorts:
-            result = ""
-    generated_sorts.append(result)
-    return result
+    return default_identifiers.generate_sort()
 
-swift_counter = -1
 def generate_swift():
-    global swift_counter
-    swift_counter += 1
-    if (swift_counter < 10):
-        return 'LSTNGS0'+str(swift_counter)
-    return 'LSTNGS' + str(swift_counter)
+    return default_identifiers.generate_swift()
+
+def generate_reference_number():
+    return default_identifiers.generate_reference_number()
 
 def get_all_currencies():
     return currencies
@@ -146,22 +190,7 @@ def get_all_stocks():
     return stocks
 
 def get_random_regional_information():
-    return '"' + random.choice(country_names) + '", "' + random.choice(postcodes) + '", "' + random.choice(cities) + '"'
-
-generated_reference_numbers = []
-def generate_reference_number():
-    global generated_reference_numbers
-    result = ""
-    while result == "":
-        numeric_part = "".join(random.choice(string.digits) for _ in range(9))
-        letter_part = "".join(random.choice(string.ascii_lowercase) for _ in range(3))
-        result += numeric_part + letter_part
-
-        if result in generated_reference_numbers:
-            result = ""
-
-    generated_reference_numbers.append(result)
-    return result
+    return random.choice(country_names), random.choice(postcodes), random.choice(cities)
 
 def generate_full_name():
     first_names = [
@@ -183,8 +212,7 @@ def generate_date(min_year, max_year, min_month=1, max_month=12, min_day=1, max_
     return str(year) + "/" + str(month) + "/" + str(day)
 
 def generate_date_between(min_date, max_date):
-    tmp = [min_date + timedelta(days=i) for i in range((max_date-min_date).days + 1)]
-    return (str(random.choice(tmp)).replace('-','/'))
+    return format_date(sample_date(min_date, max_date))
 
 def generate_random_time():
     return (str(random.randint(0, 23)) + ":" + str(random.randint(0, 59)) + ":" + str(random.randint(0, 59)))
@@ -211,10 +239,11 @@ def generate_international_number():
         result += str(random.randint(0, 9))
     return result
 
+# Exclude " characters from the list
+SALT_CHARACTERS = string.ascii_letters + string.digits + "!#$%&'()*+,-./:;<=>?@[]^_`{|}~ "
+
 def generate_salt(length = 64):
-    # Exclude " characters from the list
-    punctuation = "!#$%&'()*+,-./:;<=>?@[]^_`{|}~ "
-    return ''.join(random.choice(string.ascii_letters + string.digits + punctuation) for _ in range(length))
+    return ''.join(random.choice(SALT_CHARACTERS) for _ in range(length))
 
 def generate_hash(length = 128):
     return ''.join(random.choice(string.hexdigits) for _ in range(length)).lower()
@@ -262,6 +291,79 @@ def generate_bool():
 def generate_ip():
     return str(random.randint(0, 255)) + "." + str(random.randint(0, 255)) + "." + str(random.randint(0, 255)) + "." + str(random.randint(0, 255))
 
+# Batch versions of the generators above. Each one makes a whole column with a
+# few bulk RNG calls instead of one call per character, in the same format.
+# rng is the random module unless a seeded random.Random of its own is given.
+
+def split_in_values(characters, length):
+    return [characters[i:i + length] for i in range(0, len(characters), length)]
+
+# Random bytes below a multiple of len(SALT_CHARACTERS) map evenly on the characters, the rest are dropped
+SALT_BYTE_LIMIT = 256 // len(SALT_CHARACTERS) * len(SALT_CHARACTERS)
+SALT_BYTE_TABLE = bytes(SALT_CHARACTERS.encode()[byte % len(SALT_CHARACTERS)] if byte < SALT_BYTE_LIMIT else 0 for byte in range(256))
+SALT_DROPPED_BYTES = bytes(range(SALT_BYTE_LIMIT, 256))
+
+def generate_salt_batch(n, length = 64, rng = random):
+    needed = n * length
+    characters = b""
+    while len(characters) < needed:
+        missing = needed - len(characters)
+        characters += rng.randbytes(missing * 256 // SALT_BYTE_LIMIT + 16).translate(SALT_BYTE_TABLE, SALT_DROPPED_BYTES)
+    return split_in_values(characters[:needed].decode(), length)
+
+def generate_hash_batch(n, length = 128, rng = random):
+    if n == 0:
+        return []
+    return split_in_values(format(rng.getrandbits(4 * length * n), "x").zfill(length * n), length)
+
+def generate_international_number_batch(n, rng = random):
+    lengths = rng.choices((9, 10, 11), k=n)
+    digits = ''.join(rng.choices(string.digits, k=sum(lengths)))
+
+    result = []
+    start = 0
+    for length in lengths:
+        result.append(digits[start:start + length])
+        start += length
+    return result
+
+def generate_ip_batch(n, rng = random):
+    octets = rng.randbytes(4 * n)
+    return [str(octets[i]) + "." + str(octets[i + 1]) + "." + str(octets[i + 2]) + "." + str(octets[i + 3]) for i in range(0, 4 * n, 4)]
+
+def generate_price_batch(n, min_number = 0.01, max_number = 10000.00, default_round = 2, rng = random):
+    width = max_number - min_number
+    uniform = rng.random
+    return [round(min_number + width * uniform(), default_round) for _ in range(n)]
+
+def generate_iban_batch(account_numbers):
+    # Same as generate_iban(): "GB", "02", "28189" and account number padded to 15 digits
+    return ["GB0228189" + str(account_number).zfill(15) for account_number in account_numbers]
+
+def generate_timestamp_batch(n, min_date, max_date, hour_weights = UNIFORM_HOURS_CUMULATIVE):
+    # Same format as generate_date_between() + ' ' + generate_random_time()
+    return sample_timestamps(n, min_date, max_date, hour_weights)
+
+class ValuePool:
+    # Hands out values one by one, making them batch_size at a time with a batch generator,
+    # which draws from rng when one is given
+
+    def __init__(self, batch_function, batch_size = 1024, *arguments, rng = None):
+        self.batch_function = batch_function
+        self.batch_size = batch_size
+        self.arguments = arguments
+        self.options = {} if rng is None else { "rng": rng }
+        self.values = []
+        self.position = 0
+
+    def next_value(self):
+        if self.position == len(self.values):
+            self.values = self.batch_function(self.batch_size, *self.arguments, **self.options)
+            self.position = 0
+
+        self.position += 1
+        return self.values[self.position - 1]
+
 if __name__ == "__main__":
     print(f"Full Name: { generate_full_name() }")
     print(f"Birth Date: { generate_date(1900, 2003) }")
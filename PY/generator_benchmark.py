@@ -0,0 +1,275 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from data_generator import *
+from run_report import peak_rss_mb
+from sql_file_generator import GLOBAL_STAGES, OUTPUT_FORMATS, SCALE_PRESETS, SHARD_STAGES, GeneratorConfig, generate, prepare_shard, split_in_shards, write_stages
+
+# Measures how fast the generator makes data: values per second of the data_generator.py
+# primitives, and rows per second, bytes written and peak memory of every table stage and of
+# whole generate() runs at several scales. Results are kept as a JSON baseline, a later run
+# compared with it fails when it got slower or bigger than the threshold allows.
+# Needs nothing but the standard library. Stages and runs are measured in fresh processes.
+# A stage needs the stages before it in the same process, so its memory is the peak traced
+# memory it adds, measured in a run of its own because tracing slows the stages down.
+# write_stages() opens a buffered stream for every table, the peak of a stage without records
+# is taken off, so only what the stage itself allocates is left.
+
+# Fixed dates, so every run generates the same data
+BENCHMARK_OPENING_DATE = date(2021, 11, 1)
+BENCHMARK_TODAYS_DATE = date(2023, 1, 15)
+
+# Stages and primitives running shorter than this are too noisy to be compared with a baseline
+MIN_COMPARED_SECONDS = 0.05
+
+def reference_numbers(n):
+    identifiers = IdentifierGenerator(0)
+    return [identifiers.generate_reference_number() for _ in range(n)]
+
+def sort_codes(n):
+    identifiers = IdentifierGenerator(0)
+    return [identifiers.generate_sort() for _ in range(n)]
+
+# Primitives, each one makes n values
+PRIMITIVES = {
+    "generate_hash": lambda n: [generate_hash() for _ in range(n)],
+    "generate_salt": lambda n: [generate_salt() for _ in range(n)],
+    "generate_iban": lambda n: [generate_iban(account_number) for account_number in range(n)],
+    "generate_date_between": lambda n: [generate_date_between(BENCHMARK_OPENING_DATE, BENCHMARK_TODAYS_DATE) for _ in range(n)],
+    "generate_random_time": lambda n: [generate_random_time() for _ in range(n)],
+    "generate_reference_number": reference_numbers,
+    "generate_sort": sort_codes,
+    "generate_full_name": lambda n: [generate_full_name() for _ in range(n)],
+    "generate_address": lambda n: [generate_address() for _ in range(n)],
+    "generate_international_number": lambda n: [generate_international_number() for _ in range(n)],
+    "generate_ip": lambda n: [generate_ip() for _ in range(n)],
+    "generate_price": lambda n: [generate_price() for _ in range(n)],
+    "generate_hash_batch": generate_hash_batch,
+    "generate_salt_batch": generate_salt_batch,
+    "generate_iban_batch": lambda n: generate_iban_batch(range(n)),
+    "generate_timestamp_batch": lambda n: generate_timestamp_batch(n, BENCHMARK_OPENING_DATE, BENCHMARK_TODAYS_DATE),
+    "generate_international_number_batch": generate_international_number_batch,
+    "generate_ip_batch": generate_ip_batch,
+    "generate_price_batch": generate_price_batch,
+}
+
+def directory_size(directory):
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+def throughput(seconds, rows, size):
+    return {
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(sum(rows.values()) / seconds, 1) if seconds > 0 else 0.0,
+        "bytes": size,
+        "mb_per_second": round(size / 1e6 / seconds, 3) if seconds > 0 else 0.0,
+    }
+
+def benchmark_primitives(count, seed):
+    results = {}
+    for name, primitive in PRIMITIVES.items():
+        random.seed(seed)
+        start = time.perf_counter()
+        values = primitive(count)
+        seconds = time.perf_counter() - start
+        size = sum(len(str(value)) for value in values)
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "values_per_second": round(count / seconds, 1),
+            "bytes_per_second": round(size / seconds, 1),
+        }
+    return results
+
+def benchmark_config(customers, output_format, seed, directory, processes=1):
+    return GeneratorConfig(
+        number_of_customers=customers,
+        bank_opening_date=BENCHMARK_OPENING_DATE,
+        todays_date=BENCHMARK_TODAYS_DATE,
+        output_file_name=os.path.join(directory, "generated_data.txt"),
+        output_format=output_format,
+        master_seed=seed,
+        customers_per_shard=customers,
+        number_of_processes=processes,
+    )
+
+def empty_stage(*arguments):
+    return iter(())
+
+def traced_peak(config, stage, directory, *arguments):
+    # Peak traced memory write_stages() adds while running stage
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    write_stages(config, [stage], directory, *arguments)
+    return tracemalloc.get_traced_memory()[1] - memory_before
+
+def time_stage(config, stage, directory, trace_memory, *arguments):
+    stage_directory = os.path.join(directory, stage.__name__)
+    if trace_memory:
+        streams = traced_peak(config, empty_stage, stage_directory + "_" + empty_stage.__name__, *arguments)
+        peak = traced_peak(config, stage, stage_directory, *arguments)
+        return { "stage_memory_mb": round(max(peak - streams, 0) / 2**20, 2) }
+
+    start = time.perf_counter()
+    rows = write_stages(config, [stage], stage_directory, *arguments)
+    seconds = time.perf_counter() - start
+    return throughput(seconds, { table: count for table, count in rows.items() if count }, directory_size(stage_directory))
+
+def benchmark_stages(customers, output_format, seed, trace_memory=False):
+    # Every stage of one shard holding all customers, run one at a time as generate_shard() runs them.
+    # With trace_memory only the peak memory every stage adds to what the stages before it left is measured.
+    if trace_memory:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = benchmark_config(customers, output_format, seed, directory)
+        random.seed(config.master_seed)
+        identifiers = IdentifierGenerator(random.getrandbits(64))
+        shard = split_in_shards(config, identifiers)[0]
+
+        results = {}
+        for stage in GLOBAL_STAGES:
+            results[stage.__name__] = time_stage(config, stage, directory, trace_memory, config, identifiers)
+
+        prepare_shard(shard)
+        for stage in SHARD_STAGES:
+            results[stage.__name__] = time_stage(config, stage, directory, trace_memory, shard)
+        return results
+
+def benchmark_generate(customers, output_format, seed, processes):
+    # Whole generate() run, from seeding to the joined output
+    with tempfile.TemporaryDirectory() as directory:
+        config = benchmark_config(customers, output_format, seed, directory, processes)
+        start = time.perf_counter()
+        rows = generate(config)
+        seconds = time.perf_counter() - start
+        result = throughput(seconds, rows, directory_size(directory))
+        result["peak_rss_mb"] = peak_rss_mb()
+        return result
+
+def run_isolated(function, *arguments):
+    # Run in a fresh interpreter, so peak memory only counts this measurement
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(function, arguments)
+
+def fastest(runs, key):
+    # Best of repeated runs: the fastest one, with the lowest peak memory of all of them
+    best = dict(max(runs, key=lambda run: run[key]))
+    if "peak_rss_mb" in best:
+        best["peak_rss_mb"] = min(run["peak_rss_mb"] for run in runs)
+    return best
+
+def run_benchmark(scales, output_format="sql", repeat=3, primitive_count=20000, seed=42, processes=1):
+    results = {
+        "python": sys.version.split()[0],
+        "output_format": output_format,
+        "repeat": repeat,
+        "seed": seed,
+        "primitives": {},
+        "scales": {},
+    }
+
+    primitive_runs = [benchmark_primitives(primitive_count, seed) for _ in range(repeat)]
+    for name in PRIMITIVES:
+        results["primitives"][name] = fastest([run[name] for run in primitive_runs], "values_per_second")
+        print(f"{ name:<40}{ results['primitives'][name]['values_per_second']:>14,.0f} values/s")
+
+    for scale in scales:
+        customers = SCALE_PRESETS[scale]
+        stage_runs = [run_isolated(benchmark_stages, customers, output_format, seed) for _ in range(repeat)]
+        memory_run = run_isolated(benchmark_stages, customers, output_format, seed, True)
+        generate_runs = [run_isolated(benchmark_generate, customers, output_format, seed, processes) for _ in range(repeat)]
+
+        scale_results = {
+            "customers": customers,
+            "stages": { stage: dict(fastest([run[stage] for run in stage_runs], "rows_per_second"), **memory_run[stage]) for stage in stage_runs[0] },
+            "generate": fastest(generate_runs, "rows_per_second"),
+        }
+        results["scales"][scale] = scale_results
+
+        for stage, result in scale_results["stages"].items():
+            print(f"{ scale:<16}{ stage:<28}{ result['rows_per_second']:>14,.0f} rows/s{ result['mb_per_second']:>10.2f} MB/s{ result['stage_memory_mb']:>10.1f} MB stage peak")
+        result = scale_results["generate"]
+        print(f"{ scale:<16}{ 'generate':<28}{ result['rows_per_second']:>14,.0f} rows/s{ result['mb_per_second']:>10.2f} MB/s{ result['peak_rss_mb']:>10.1f} MB peak RSS")
+    return results
+
+def compared_metrics(results):
+    # (name, seconds, value, higher is better) of every number compared with a baseline
+    metrics = {}
+    for name, result in results["primitives"].items():
+        metrics["primitives " + name] = (result["seconds"], result["values_per_second"], True)
+    for scale, scale_results in results["scales"].items():
+        runs = dict(scale_results["stages"])
+        runs["generate"] = scale_results["generate"]
+        for stage, result in runs.items():
+            metrics[scale + " " + stage + " rows/s"] = (result["seconds"], result["rows_per_second"], True)
+            # Stages keep the traced memory they add, whole runs the peak RSS of their processes.
+            # Baselines with peak_memory_mb counted the table streams as well and are not compared.
+            for key in ["stage_memory_mb", "peak_rss_mb"]:
+                if key in result:
+                    metrics[scale + " " + stage + " " + key] = (result["seconds"], result[key], False)
+    return metrics
+
+def find_regressions(results, baseline, threshold):
+    # Lines describing every metric that got worse than the baseline by more than threshold
+    regressions = []
+    current = compared_metrics(results)
+    for name, (seconds, old_value, higher_is_better) in compared_metrics(baseline).items():
+        if name not in current or seconds < MIN_COMPARED_SECONDS or not old_value:
+            continue
+
+        new_value = current[name][1]
+        change = new_value / old_value - 1
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            regressions.append(f"{ name }: { old_value } -> { new_value } ({ change:+.1%})")
+    return regressions
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description="Measure generator throughput and memory, and compare it with a baseline")
+    parser.add_argument("--scales", nargs="+", choices=SCALE_PRESETS, default=["small", "big_production", "10x"], help="dataset sizes to run the stages at (default: small big_production 10x)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="sql", help="output format the stages write (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every measurement, the best one is kept (default: %(default)s)")
+    parser.add_argument("--primitive-count", type=int, default=20000, help="values made by every primitive in one run (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated data (default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=1, help="processes of the whole generate() runs (default: %(default)s)")
+    parser.add_argument("--output", default="generator_benchmark.json", help="JSON results file (default: %(default)s)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also save the results as baseline to PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="baseline to compare with, exits with 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed loss of throughput or growth of peak memory against the baseline (default: %(default)s)")
+    return parser.parse_args(arguments)
+
+def main(arguments=None):
+    arguments = parse_arguments(arguments)
+    if arguments.repeat < 1:
+        raise SystemExit("--repeat must be at least 1")
+
+    results = run_benchmark(arguments.scales, arguments.format, arguments.repeat, arguments.primitive_count, arguments.seed, arguments.processes)
+
+    for path in [arguments.output, arguments.save_baseline]:
+        if path:
+            with open(path, 'w', encoding="utf-8") as results_file:
+                json.dump(results, results_file, indent=4)
+
+    if arguments.baseline:
+        with open(arguments.baseline, 'r', encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = find_regressions(results, baseline, arguments.threshold)
+        for line in regressions:
+            print("Regression " + line)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against " + arguments.baseline)
+
+if __name__ == "__main__":
+    main()
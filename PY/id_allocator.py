@@ -0,0 +1,76 @@
+import random
+
+# Number of Feistel rounds, 4 rounds already give a well mixed permutation
+FEISTEL_ROUNDS = 4
+
+MASK_64 = (1 << 64) - 1
+
+def mix(value, key):
+    # splitmix64 finaliser, mixes all bits of value and key into the result
+    value = (value + key + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+class UniqueIdAllocator:
+    # Hands out every number of [0, space_size) exactly once in a seeded random order.
+    # The order is a Feistel permutation of the space, so the n-th identifier is
+    # computed directly from n: no list of used identifiers and no retries.
+
+    def __init__(self, space_size, seed=None):
+        if space_size < 1:
+            raise ValueError("Identifier space must not be empty")
+
+        self.space_size = space_size
+
+        # Smallest even number of bits that covers the space, split in two halves
+        self.half_bits = max(1, ((space_size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+        self.set_seed(seed)
+
+    def set_seed(self, seed=None):
+        # Start over with the permutation chosen by seed, the same seed gives the same identifiers
+        if seed is None:
+            seed = random.getrandbits(64)
+
+        key_source = random.Random(seed)
+        self.round_keys = [key_source.getrandbits(64) for _ in range(FEISTEL_ROUNDS)]
+        self.allocated = 0
+
+    def permute(self, value):
+        left = value >> self.half_bits
+        right = value & self.half_mask
+
+        for key in self.round_keys:
+            left, right = right, left ^ (mix(right, key) & self.half_mask)
+
+        return (left << self.half_bits) | right
+
+    def at(self, index):
+        # Identifier handed out by the index-th call of allocate()
+        if not 0 <= index < self.space_size:
+            raise IndexError("Identifier index " + str(index) + " is outside of space of " + str(self.space_size))
+
+        # Cycle walking: the Feistel domain is at most 4 times bigger than the space,
+        # so values outside of the space are skipped in a couple of steps on average
+        value = self.permute(index)
+        while value >= self.space_size:
+            value = self.permute(value)
+        return value
+
+    def allocate(self):
+        if self.allocated >= self.space_size:
+            raise ValueError("All " + str(self.space_size) + " identifiers have been allocated")
+
+        value = self.at(self.allocated)
+        self.allocated += 1
+        return value
+
+    def remaining(self):
+        return self.space_size - self.allocated
+
+    def check_capacity(self, count, name="identifiers"):
+        # Fail before generation starts rather than in the middle of it
+        if count > self.remaining():
+            raise ValueError("Cannot generate " + str(count) + " unique " + name + ", only " + str(self.remaining()) + " are left")
@@ -0,0 +1,207 @@
+import random
+from array import array
+from functools import lru_cache
+
+# Picks foreign keys with a skewed popularity, so a few hot accounts and customers get most of
+# the bargains, cards and sessions, as payroll and merchant accounts do in a real bank. Keys are
+# ranked in the order they are given, the first key is the hottest. A distribution is a spec:
+#
+#   uniform           every key equally often
+#   zipf:S            key of rank r gets weight 1 / r^S, S = 1 when not given
+#   power:TOP:SHARE   Zipf-like power law, with the exponent that gives the TOP keys SHARE of the picks
+#   hot:TOP:SHARE     hot set, the TOP keys get SHARE of the picks, every key of a set equally often
+#
+# TOP is a number of keys, or below 1 a share of all keys, e.g. hot:0.01:0.8 sends 80% of the
+# picks to the hottest 1% of the keys. Skewed keys are drawn from an alias table in O(1) with a
+# single random number, uniform keys with random.choice() as before, so uniform output does not change.
+
+DISTRIBUTIONS = ["uniform", "zipf", "power", "hot"]
+
+# Relationships whose keys can be skewed, and what is picked for them
+KEY_RELATIONSHIPS = {
+    "bargain_accounts": "sender and receiver accounts of local bargains",
+    "iban_pairs": "sender and receiver IBANs of international bargains",
+    "card_accounts": "account of every card",
+    "session_customers": "customer of every session",
+    "account_customers": "customer of every account in client_account",
+}
+
+DEFAULT_ZIPF_EXPONENT = 1.0
+
+# Steps of the bisection finding the exponent of power:TOP:SHARE, and the largest exponent tried
+POWER_SEARCH_STEPS = 40
+MAX_POWER_EXPONENT = 20.0
+
+def parse_distribution(spec):
+    # "hot:0.01:0.8" to ("hot", [0.01, 0.8]), checking the name and number of parameters
+    name, *parameters = spec.split(":")
+    if name not in DISTRIBUTIONS:
+        raise ValueError("Unknown key distribution " + spec + ", expected one of " + ", ".join(DISTRIBUTIONS))
+
+    try:
+        parameters = [float(parameter) for parameter in parameters]
+    except ValueError:
+        raise ValueError("Parameters of key distribution " + spec + " have to be numbers")
+
+    expected = { "uniform": [0], "zipf": [0, 1], "power": [2], "hot": [2] }[name]
+    if len(parameters) not in expected:
+        raise ValueError("Key distribution " + spec + " needs " + " or ".join(str(count) for count in expected) + " parameters")
+    if name == "zipf" and parameters and parameters[0] < 0:
+        raise ValueError("Zipf exponent of " + spec + " cannot be negative")
+    if name in ("power", "hot") and (parameters[0] <= 0 or not 0 < parameters[1] < 1):
+        # Some picks have to stay outside of the top keys, or a pair of different keys could never be drawn
+        raise ValueError("Key distribution " + spec + " needs TOP above 0 and SHARE between 0 and 1")
+    return name, parameters
+
+def parse_key_distributions(values):
+    # --skew values, RELATIONSHIP=SPEC or just SPEC for every relationship, to { relationship: spec }
+    distributions = {}
+    for value in values or []:
+        relationship, _, spec = value.rpartition("=")
+        relationships = [relationship] if relationship else list(KEY_RELATIONSHIPS)
+        if relationship and relationship not in KEY_RELATIONSHIPS:
+            raise ValueError("Unknown relationship " + relationship + ", expected one of " + ", ".join(KEY_RELATIONSHIPS))
+
+        parse_distribution(spec)
+        for name in relationships:
+            distributions[name] = spec
+    return distributions
+
+def top_keys(top, n):
+    # TOP of a spec as a number of keys of n
+    if top < 1:
+        return max(1, round(top * n))
+    return min(int(top), n)
+
+def zipf_weights(n, exponent):
+    return [(rank + 1) ** -exponent for rank in range(n)]
+
+@lru_cache(maxsize=64)
+def power_exponent(n, top, share):
+    # Exponent of the Zipf weights of n keys, where the top keys get share of the weight.
+    # The share of the top keys only grows with the exponent, so bisection finds it.
+    if share <= top / n:
+        return 0.0
+
+    low, high = 0.0, MAX_POWER_EXPONENT
+    for _ in range(POWER_SEARCH_STEPS):
+        exponent = (low + high) / 2
+        weights = zipf_weights(n, exponent)
+        if sum(weights[:top]) / sum(weights) < share:
+            low = exponent
+        else:
+            high = exponent
+    return (low + high) / 2
+
+def distribution_weights(name, parameters, n):
+    if name == "zipf":
+        return zipf_weights(n, parameters[0] if parameters else DEFAULT_ZIPF_EXPONENT)
+
+    top = top_keys(parameters[0], n)
+    share = parameters[1]
+    if name == "power":
+        return zipf_weights(n, power_exponent(n, top, share))
+
+    # Hot set, when it holds every key there is no rest to share with
+    if top == n:
+        return [1.0] * n
+    return [share / top] * top + [(1 - share) / (n - top)] * (n - top)
+
+class AliasTable:
+    # Vose's alias method: every slot holds the probability of keeping its own index and the
+    # index it hands the rest to, so an index is drawn with one random number whatever the weights
+
+    def __init__(self, weights):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("Alias table needs at least 1 weight")
+
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self.probabilities = array("d", [1.0] * n)
+        self.aliases = array("Q", range(n))
+
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            index = small.pop()
+            alias = large[-1]
+            self.probabilities[index] = scaled[index]
+            self.aliases[index] = alias
+
+            scaled[alias] -= 1 - scaled[index]
+            if scaled[alias] < 1:
+                small.append(large.pop())
+
+        # Whatever is left is 1 up to rounding errors and keeps its own index
+        self.n = n
+
+    def sample(self, rng=random):
+        # Whole part of the random number picks the slot, the fraction decides between slot and alias
+        position = rng.random() * self.n
+        index = int(position)
+        if position - index < self.probabilities[index]:
+            return index
+        return self.aliases[index]
+
+class UniformKeys:
+    def __init__(self, keys, rng=random):
+        self.keys = keys
+        self.rng = rng
+
+    def choice(self):
+        return self.rng.choice(self.keys)
+
+    def pair(self):
+        return self.rng.sample(self.keys, 2)
+
+class SkewedKeys:
+    def __init__(self, keys, weights, rng=random):
+        self.keys = keys
+        self.table = AliasTable(weights)
+        self.rng = rng
+
+    def choice(self):
+        return self.keys[self.table.sample(self.rng)]
+
+    def pair(self):
+        # Two different keys, a spec always leaves some picks to other keys than the hottest
+        first = second = self.choice()
+        while first == second:
+            second = self.choice()
+        return first, second
+
+def key_sampler(spec, keys, rng=random):
+    # Picks keys, any sequence, with the distribution of spec, using rng or the random module
+    name, parameters = parse_distribution(spec or "uniform")
+    if name == "uniform" or len(keys) < 2:
+        return UniformKeys(keys, rng)
+    return SkewedKeys(keys, distribution_weights(name, parameters, len(keys)), rng)
+
+def top_share(sampler, top, picks):
+    # Share of picks that went to the top keys, to check what a spec does
+    hot = set(sampler.keys[:top])
+    return sum(1 for _ in range(picks) if sampler.choice() in hot) / picks
+
+if __name__ == "__main__":
+    # Share of the hottest keys of every kind of distribution, and speed against random.choices()
+    import timeit
+
+    keys = range(100000)
+    picks = 200000
+    for spec in ["uniform", "zipf", "zipf:0.8", "power:0.01:0.5", "power:100:0.9", "hot:0.01:0.8", "hot:10:0.3"]:
+        sampler = key_sampler(spec, keys)
+        print(f"{ spec:<16} top 10 { top_share(sampler, 10, picks):6.1%}  top 1% { top_share(sampler, 1000, picks):6.1%}  top 10% { top_share(sampler, 10000, picks):6.1%}")
+
+    count = 100000
+    weights = zipf_weights(len(keys), DEFAULT_ZIPF_EXPONENT)
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    sampler = key_sampler("zipf", keys)
+    print(f"{ 'random.choices':<40}{ timeit.timeit(lambda: random.choices(keys, cum_weights=cumulative, k=1)[0], number=count) / count * 1e6:>10.2f} us per key")
+    print(f"{ 'alias table':<40}{ timeit.timeit(sampler.choice, number=count) / count * 1e6:>10.2f} us per key")
+    print(f"{ 'build alias table of 100000 keys':<40}{ timeit.timeit(lambda: key_sampler('power:0.01:0.5', keys), number=1) * 1e3:>10.2f} ms")
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+# Typed rows of every table. Values are kept as Python objects and only turned
+# into SQL text by the output writer, so no stage has to parse a formatted row.
+
+def record_type(name, table, columns, load_time_columns=()):
+    # load_time_columns hold a TimeFromNow, a moment relative to the time the data is loaded
+    result = namedtuple(name, columns)
+    result.table = table
+    result.load_time_columns = tuple(load_time_columns)
+    return result
+
+BankInformation = record_type("BankInformation", "bank_information", ["bank_ID", "sort_code", "SWIFT"])
+CurrencyList = record_type("CurrencyList", "currency_list", ["currency_ID", "alphabetic_code", "symbol"])
+Stock = record_type("Stock", "stock", ["stock_code", "stock_name", "sell_price", "buy_price", "available_to_buy"])
+RegionalInformation = record_type("RegionalInformation", "regional_information", ["regional_information_ID", "country_name", "postcode", "city_name"])
+ClientDetails = record_type("ClientDetails", "client_details", ["reference_number", "full_name", "birth_date", "adress", "adress_2", "regional_information_ID", "telephone_number"])
+ClientAccess = record_type("ClientAccess", "client_access", ["reference_number", "password_salt", "password_hash"])
+CustomerSession = record_type("CustomerSession", "customer_sessions", ["reference_number", "customer_IP", "secret_key_salt", "secret_key_hashed", "token_salt", "token_hashed", "token_expiry_date"], ["token_expiry_date"])
+Account = record_type("Account", "account", ["account_number", "account_status", "bank_ID"])
+ClientAccount = record_type("ClientAccount", "client_account", ["reference_number", "account_number"])
+AccountIBAN = record_type("AccountIBAN", "account_IBAN", ["account_number", "IBAN"])
+AccountBalance = record_type("AccountBalance", "account_balance", ["account_number", "currency_ID", "amount"])
+CardDetails = record_type("CardDetails", "card_details", ["card_ID", "card_salt", "card_hash", "CVV_hash", "PIN_hash", "internet_shopping_available", "frozen"])
+AccountCard = record_type("AccountCard", "account_card", ["card_ID", "account_number", "card_main_currency"])
+CardDailyLimit = record_type("CardDailyLimit", "card_daily_limit", ["card_ID", "limit_amount"])
+Bargain = record_type("Bargain", "bargain", ["bargain_ID", "amount", "currency_ID", "bargain_status", "bargain_date"])
+LocalBargain = record_type("LocalBargain", "local_bargain", ["bargain_ID", "sender_account_number", "receiver_account_number"])
+InternationalBargain = record_type("InternationalBargain", "international_bargain", ["bargain_ID", "sender_IBAN", "receiver_IBAN"])
+OutgoingBargain = record_type("OutgoingBargain", "outgoing_bargain", ["bargain_ID", "planned_date"])
+IncomingBargain = record_type("IncomingBargain", "incoming_bargain", ["bargain_ID", "receipt_date"])
+AccountStock = record_type("AccountStock", "account_stock", ["account_number", "stock_code", "shares"])
+Loan = record_type("Loan", "loan", ["loan_ID", "given_amount", "repaid_amount", "currency_ID"])
+LoanPayment = record_type("LoanPayment", "loan_payment", ["loan_ID", "total_expected_number_of_payments", "first_payment_date", "payment_due_date"])
+AccountLoan = record_type("AccountLoan", "account_loan", ["account_number", "loan_ID", "payment_rate"])
+
+# All record types, in the order their tables are written to the output file
+RECORD_TYPES = [
+    BankInformation,
+    CurrencyList,
+    Stock,
+    RegionalInformation,
+    ClientDetails,
+    ClientAccess,
+    CustomerSession,
+    Account,
+    ClientAccount,
+    AccountIBAN,
+    AccountBalance,
+    CardDetails,
+    AccountCard,
+    CardDailyLimit,
+    Bargain,
+    LocalBargain,
+    InternationalBargain,
+    OutgoingBargain,
+    IncomingBargain,
+    AccountStock,
+    Loan,
+    LoanPayment,
+    AccountLoan,
+]
@@ -0,0 +1,208 @@
+import cProfile
+import json
+import os
+import pstats
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Instrumentation of generator runs: wall and CPU time and rows of every stage, progress lines
+# with an ETA, peak traced memory and a cProfile dump. Every spool directory keeps the reports of
+# its own stages, so shards running in other processes hand them back through the file system,
+# and generate() puts them together in one JSON report next to the output file.
+# Nothing of it runs unless one of the options of GeneratorConfig turns it on.
+
+RUN_REPORT_EXTENSION = ".report.json"
+STAGE_REPORT_FILE = "stages.json"
+PROFILE_FILE = "profile.stats"
+
+# Records between two looks at the clock for progress lines
+PROGRESS_CHECK_RECORDS = 10000
+
+# Allocation sites kept for every stage when memory is traced
+TOP_ALLOCATIONS = 5
+
+def instrumented(config):
+    return bool(config.report or config.progress_interval or config.trace_memory or config.profile_file)
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{ hours:02}:{ minutes:02}:{ seconds:02}"
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, children are the shard processes that have finished
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
+
+@contextmanager
+def profiled(path):
+    # Profile the block into path, one profile per block so blocks of different processes can be merged
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+class StageMonitor:
+    # Times the stages written to one spool directory and counts the rows they make. With the
+    # rows all stages are expected to make, progress lines show the share done and an ETA.
+
+    def __init__(self, config, label, expected_rows=None):
+        self.config = config
+        self.label = label
+        self.expected_rows = expected_rows
+        self.stages = []
+        self.rows_done = 0
+        self.start = time.perf_counter()
+
+        if config.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def watch(self, name, records):
+        # Pass records of a stage through, the time of the stage includes writing them
+        rows = {}
+        written = 0
+        interval = self.config.progress_interval
+        # Peak memory of a stage is what it adds to the memory of the stages before it and the open spools
+        if self.config.trace_memory:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        next_progress = wall_start + interval if interval else None
+
+        for record in records:
+            yield record
+            rows[record.table] = rows.get(record.table, 0) + 1
+            written += 1
+
+            if next_progress and written % PROGRESS_CHECK_RECORDS == 0:
+                now = time.perf_counter()
+                if now >= next_progress:
+                    print(f"[{ self.label }] { name }: { written:,} rows, { written / (now - wall_start):,.0f} rows/s" + self.estimate(self.rows_done + written, now), flush=True)
+                    next_progress = now + interval
+
+        self.rows_done += written
+        wall_seconds = time.perf_counter() - wall_start
+        report = {
+            "stage": name,
+            "label": self.label,
+            "wall_seconds": round(wall_seconds, 4),
+            "cpu_seconds": round(time.process_time() - cpu_start, 4),
+            "rows": rows,
+        }
+        if self.config.trace_memory:
+            report["peak_memory_mb"] = round((tracemalloc.get_traced_memory()[1] - memory_start) / 2**20, 2)
+            report["top_allocations"] = [str(statistic) for statistic in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]]
+        self.stages.append(report)
+
+    def estimate(self, rows_done, now):
+        # Share of expected rows done and the time left at the speed so far, the expected rows
+        # of tables with a random number of rows are averages, so the share is kept below 100%
+        if not self.expected_rows:
+            return ""
+        share = min(rows_done / self.expected_rows, 0.999)
+        elapsed = now - self.start
+        return f", { share:.1%} done, ETA { format_duration(elapsed / share - elapsed) }"
+
+    def save(self, directory):
+        with open(os.path.join(directory, STAGE_REPORT_FILE), 'w', encoding="utf-8") as report_file:
+            json.dump(self.stages, report_file)
+
+def read_stage_reports(directories):
+    reports = []
+    for directory in directories:
+        path = os.path.join(directory, STAGE_REPORT_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding="utf-8") as report_file:
+                reports += json.load(report_file)
+    return reports
+
+def summarize_stages(reports):
+    # Stages of all shards added up by stage name, in the order they first ran
+    stages = {}
+    for report in reports:
+        stage = stages.setdefault(report["stage"], { "runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": {} })
+        stage["runs"] += 1
+        stage["wall_seconds"] = round(stage["wall_seconds"] + report["wall_seconds"], 4)
+        stage["cpu_seconds"] = round(stage["cpu_seconds"] + report["cpu_seconds"], 4)
+        for table, count in report["rows"].items():
+            stage["rows"][table] = stage["rows"].get(table, 0) + count
+        if "peak_memory_mb" in report:
+            stage["peak_memory_mb"] = max(stage.get("peak_memory_mb", 0), report["peak_memory_mb"])
+
+    for stage in stages.values():
+        rows = sum(stage["rows"].values())
+        stage["rows_per_cpu_second"] = round(rows / stage["cpu_seconds"], 1) if stage["cpu_seconds"] > 0 else 0.0
+    return stages
+
+class ShardProgress:
+    # Progress line with an ETA every time a shard is done, measured in customers of finished shards
+
+    def __init__(self, total_customers):
+        self.total_customers = total_customers
+        self.customers = 0
+        self.shards = 0
+        self.start = time.perf_counter()
+
+    def shard_done(self, shard, number_of_shards):
+        self.customers += shard.customers
+        self.shards += 1
+        elapsed = time.perf_counter() - self.start
+        share = self.customers / self.total_customers if self.total_customers else 1.0
+        eta = elapsed / share - elapsed if share > 0 else 0.0
+        print(f"Shards { self.shards }/{ number_of_shards }, { share:.1%} of customers, { format_duration(elapsed) } elapsed, ETA { format_duration(eta) }", flush=True)
+
+class RunReport:
+    # Phases of one generate() run and everything the stage monitors found
+
+    def __init__(self, config):
+        self.config = config
+        self.started_at = datetime.now().isoformat(" ", "seconds")
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        # Children of earlier runs in the same interpreter are counted in RUSAGE_CHILDREN too
+        self.children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name, profile_path=None):
+        start = time.perf_counter()
+        with profiled(profile_path) if profile_path else nullcontext():
+            yield
+        self.phases[name] = round(time.perf_counter() - start, 4)
+
+    def finish(self, rows, directories):
+        reports = read_stage_reports(directories)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {
+            "started_at": self.started_at,
+            "output_file_name": self.config.output_file_name,
+            "number_of_customers": self.config.number_of_customers,
+            "number_of_processes": self.config.number_of_processes,
+            "wall_seconds": round(time.perf_counter() - self.start, 4),
+            "cpu_seconds": round(time.process_time() - self.cpu_start + children.ru_utime + children.ru_stime - self.children_start.ru_utime - self.children_start.ru_stime, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "rows": rows,
+            "phases": self.phases,
+            "stages": summarize_stages(reports),
+            "stage_runs": reports,
+        }
+
+def merge_profiles(directories, output_path):
+    # One profile of every spool directory and of the main process, added up into output_path
+    paths = [os.path.join(directory, PROFILE_FILE) for directory in directories]
+    paths = [path for path in paths if os.path.exists(path)]
+    if paths:
+        pstats.Stats(*paths).dump_stats(output_path)
+
+def write_run_report(report, path):
+    with open(path, 'w', encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=4)
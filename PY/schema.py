@@ -0,0 +1,90 @@
+import os
+import re
+
+# Reads the table definitions of the banking_system schema, so tools can follow the
+# columns, keys and foreign keys of SQL/final_database_file.sql without repeating them.
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SQL", "final_database_file.sql")
+
+CREATE_TABLE = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\)([^;]*);", re.DOTALL)
+FOREIGN_KEY = re.compile(r"FOREIGN KEY \(([^)]*)\) REFERENCES (\w+)\s*\(([^)]*)\)")
+KEY_COLUMNS = re.compile(r"(PRIMARY KEY|UNIQUE(?: KEY| INDEX)?(?: \w+)?) \(([^)]*)\)")
+
+class Table:
+    # Definition of one table: its columns in order, keys and the foreign keys pointing out of it
+
+    def __init__(self, name, columns, primary_key, unique_keys, foreign_keys, definition):
+        self.name = name
+        self.columns = columns
+        self.primary_key = primary_key
+        self.unique_keys = unique_keys
+        self.foreign_keys = foreign_keys
+        self.definition = definition
+
+    def parents(self):
+        # Tables this table points to, without itself
+        return sorted(set(parent for _, parent, _ in self.foreign_keys if parent != self.name))
+
+def split_columns(text):
+    return [column.strip().strip("`") for column in text.split(",")]
+
+def split_definitions(body):
+    # Split the body of CREATE TABLE on the commas that are not inside of brackets
+    result = []
+    depth = 0
+    current = ""
+    for character in body:
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        if character == "," and depth == 0:
+            result.append(current.strip())
+            current = ""
+        else:
+            current += character
+    if current.strip():
+        result.append(current.strip())
+    return result
+
+def strip_comments(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    return re.sub(r"--[^\n]*", "", text)
+
+def parse_tables(text):
+    # Tables of the schema text in the order they are created
+    tables = {}
+    for name, body, _ in CREATE_TABLE.findall(strip_comments(text)):
+        columns = {}
+        primary_key = []
+        unique_keys = []
+        foreign_keys = []
+
+        for definition in split_definitions(body):
+            foreign_key = FOREIGN_KEY.match(definition)
+            key = KEY_COLUMNS.match(definition)
+
+            if foreign_key:
+                foreign_keys.append((split_columns(foreign_key.group(1)), foreign_key.group(2), split_columns(foreign_key.group(3))))
+            elif key:
+                if key.group(1) == "PRIMARY KEY":
+                    primary_key = split_columns(key.group(2))
+                else:
+                    unique_keys.append(split_columns(key.group(2)))
+            elif re.match(r"(INDEX|KEY|CONSTRAINT|CHECK)\b", definition):
+                continue
+            else:
+                column, column_type = definition.split(None, 1)
+                column = column.strip("`")
+                columns[column] = column_type
+                if "PRIMARY KEY" in column_type:
+                    primary_key = [column]
+                if re.search(r"\bUNIQUE\b", column_type):
+                    unique_keys.append([column])
+
+        tables[name] = Table(name, columns, primary_key, unique_keys, foreign_keys, body)
+    return tables
+
+def load_schema(path=SCHEMA_FILE):
+    with open(path, 'r', encoding="utf-8") as schema_file:
+        return parse_tables(schema_file.read())
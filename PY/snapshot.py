@@ -0,0 +1,450 @@
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import repeat
+from operator import add, floordiv, itemgetter, mod, mul
+from records import RECORD_TYPES
+from sql_writer import DEFAULT_BATCH_SIZE, TimeFromNow
+from time_sampler import SECONDS_IN_DAY, format_date, format_time
+
+# Columnar binary snapshot of a generated dataset, so the same rows can be written again as
+# INSERT statements, data files or into a database without generating them again. Every column
+# is a file of fixed-width values, strings are a file of UTF-8 bytes with the end offset of every
+# value, dates and times the generator keeps as text are stored as numbers and formatted back,
+# and repeated strings like statuses, currencies and cities are dictionary-encoded. A
+# snapshot is a directory with one segment for every spool directory of the run, the global
+# tables and every shard, read back through mmap one segment and batch of rows at a time.
+
+SNAPSHOT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+
+# Subdirectory of a spool directory the snapshot of its tables is written to
+SNAPSHOT_SPOOL = "snapshot"
+
+# Rows decoded at once when a snapshot is read
+READ_BATCH_SIZE = 65536
+
+# Columns of few distinct strings, stored as int32 codes of a dictionary kept in the table file
+DICTIONARY_COLUMNS = {
+    "account_status",
+    "bargain_status",
+    "alphabetic_code",
+    "symbol",
+    "country_name",
+    "city_name",
+    "stock_code",
+    "stock_name",
+}
+
+# Python type of every kind of column, and the array type code of its values file
+COLUMN_KINDS = {
+    "int": (int, "q"),
+    "float": (float, "d"),
+    "bool": (bool, "b"),
+    "interval": (TimeFromNow, "q"),
+    "date": (date, "q"),
+    "datetime": (datetime, "q"),
+    "string": (str, "Q"),
+    "dictionary": (str, "i"),
+    "slash_date": (str, "q"),
+    "short_date": (str, "q"),
+    "timestamp": (str, "q"),
+}
+
+# Datetimes and intervals are stored as microseconds, datetimes since this moment
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Values of every kind of column, None is stored as the first value and marked in the nulls file
+ENCODERS = {
+    "int": lambda value: 0 if value is None else value,
+    "float": lambda value: 0.0 if value is None else value,
+    "bool": lambda value: 0 if value is None else int(value),
+    "interval": lambda value: 0 if value is None else value // MICROSECOND,
+    "date": lambda value: 0 if value is None else value.toordinal(),
+    "datetime": lambda value: 0 if value is None else (value - EPOCH) // MICROSECOND,
+}
+
+DECODERS = {
+    "int": None,
+    "float": None,
+    "bool": bool,
+    "interval": lambda value: TimeFromNow(microseconds=value),
+    "date": date.fromordinal,
+    "datetime": lambda value: EPOCH + timedelta(microseconds=value),
+}
+
+# Dates and times the generator writes as text: format_date() dates like 2022/01/05 and dates of
+# generate_date() without zero padding like 1950/3/7 as day ordinals, format_date() + " " +
+# format_time() like 2022/01/05 9:5:30 as seconds since day 1. A value only has a kind when
+# formatting its number gives back exactly the same text, and 0 is left for None.
+def parse_day(text):
+    try:
+        year, month, day = text.split("/")
+        return date(int(year), int(month), int(day)).toordinal()
+    except (ValueError, OverflowError):
+        return None
+
+def parse_time_of_day(text):
+    # Time of a timestamp with the space in front of it, " 9:5:30"
+    try:
+        hours, minutes, seconds = map(int, text[1:].split(":"))
+    except ValueError:
+        return None
+    second = (hours * 60 + minutes) * 60 + seconds
+    return second if 0 <= second < SECONDS_IN_DAY else None
+
+def short_date_text(day):
+    return str(day.year) + "/" + str(day.month) + "/" + str(day.day)
+
+class TextCache:
+    # Numbers and texts of one format both ways, kept in dicts as days and times of day repeat a
+    # lot, so a whole batch is looked up with map() instead of parsed and formatted value by value
+
+    def __init__(self, parse, format_value):
+        self.parse = parse
+        self.format_value = format_value
+        self.numbers = {}
+        self.texts = {}
+
+    def numbers_of(self, texts):
+        # Numbers of texts, None when one of them is not what format_value makes of its number
+        numbers = list(map(self.numbers.get, texts))
+        if None not in numbers:
+            return numbers
+        for text in { text for text in texts if text not in self.numbers }:
+            number = self.parse(text)
+            if number is None or self.texts_of([number])[0] != text:
+                return None
+            self.numbers[text] = number
+        return list(map(self.numbers.get, texts))
+
+    def texts_of(self, numbers):
+        texts = list(map(self.texts.get, numbers))
+        if None not in texts:
+            return texts
+        for number in { number for number in numbers if number not in self.texts }:
+            self.texts[number] = self.format_value(number)
+        return list(map(self.texts.get, numbers))
+
+SLASH_DATES = TextCache(parse_day, lambda ordinal: format_date(date.fromordinal(ordinal)))
+SHORT_DATES = TextCache(parse_day, lambda ordinal: short_date_text(date.fromordinal(ordinal)))
+TIMES_OF_DAY = TextCache(parse_time_of_day, lambda second: " " + format_time(second))
+
+# Whole batches are split and joined with map() and the functions of operator, not value by value
+DATE_PART = itemgetter(slice(None, 10))
+TIME_PART = itemgetter(slice(10, None))
+
+def timestamp_numbers(texts):
+    # format_date() is always 10 characters, the time of day with its space follows
+    ordinals = SLASH_DATES.numbers_of(list(map(DATE_PART, texts)))
+    seconds = TIMES_OF_DAY.numbers_of(list(map(TIME_PART, texts)))
+    if ordinals is None or seconds is None:
+        return None
+    return list(map(add, map(mul, ordinals, repeat(SECONDS_IN_DAY)), seconds))
+
+def timestamp_texts(numbers):
+    days = SLASH_DATES.texts_of(list(map(floordiv, numbers, repeat(SECONDS_IN_DAY))))
+    times = TIMES_OF_DAY.texts_of(list(map(mod, numbers, repeat(SECONDS_IN_DAY))))
+    return list(map(add, days, times))
+
+# Numbers of texts and texts of numbers of every kind of text column, in the order the kinds are tried
+TEXT_KINDS = {
+    "slash_date": (SLASH_DATES.numbers_of, SLASH_DATES.texts_of),
+    "short_date": (SHORT_DATES.numbers_of, SHORT_DATES.texts_of),
+    "timestamp": (timestamp_numbers, timestamp_texts),
+}
+
+def encode_text(kind, values):
+    # Numbers of values of a text kind, None when one of them is not in its format
+    if None in values:
+        numbers = encode_text(kind, [value for value in values if value is not None])
+        if numbers is None:
+            return None
+        numbers = iter(numbers)
+        return [0 if value is None else next(numbers) for value in values]
+    return TEXT_KINDS[kind][0](values)
+
+def decode_text(kind, numbers):
+    if 0 in numbers:
+        texts = iter(decode_text(kind, [number for number in numbers if number]))
+        return [next(texts) if number else None for number in numbers]
+    return TEXT_KINDS[kind][1](numbers)
+
+def text_kind(values):
+    # First text kind all values are in, "string" when there is none
+    for kind in TEXT_KINDS:
+        if encode_text(kind, values) is not None:
+            return kind
+    return "string"
+
+def column_kind(column, value):
+    for kind, (value_type, _) in COLUMN_KINDS.items():
+        if type(value) is value_type:
+            if value_type is str:
+                return "dictionary" if column in DICTIONARY_COLUMNS else "string"
+            return kind
+    raise ValueError("Column " + column + " holds a " + type(value).__name__ + ", which cannot be kept in a snapshot")
+
+class SnapshotColumn:
+    # Values of one column, written batch by batch to <table>.<column>.values and, once a None
+    # shows up, a byte per row to <table>.<column>.nulls
+
+    def __init__(self, directory, table, name):
+        self.path = os.path.join(directory, table + "." + name)
+        self.name = name
+        self.kind = None
+        self.rows = 0
+        self.values_file = None
+        self.strings_file = None
+        self.nulls_file = None
+        self.string_end = 0
+        self.dictionary = {}
+
+    def write(self, values):
+        types = set(map(type, values))
+        has_nulls = type(None) in types
+        types.discard(type(None))
+
+        if types and self.kind is None:
+            self.kind = column_kind(self.name, next(value for value in values if value is not None))
+            if self.kind == "string":
+                self.kind = text_kind(values)
+            self.values_file = open(self.path + ".values", 'wb')
+            if self.kind == "string":
+                self.strings_file = open(self.path + ".strings", 'wb')
+            # Rows before the first value were all None
+            self.write_values([None] * self.rows)
+
+        # Writers format values by their exact type, a column has to give back the types it was given
+        if self.kind and types - { COLUMN_KINDS[self.kind][0] }:
+            raise ValueError("Column " + self.name + " holds values of more than one type: " + ", ".join(sorted(value_type.__name__ for value_type in types | { COLUMN_KINDS[self.kind][0] })))
+
+        if has_nulls and self.nulls_file is None:
+            self.nulls_file = open(self.path + ".nulls", 'wb')
+            self.nulls_file.write(bytes(self.rows))
+        if self.nulls_file:
+            self.nulls_file.write(bytes(value is None for value in values))
+
+        if self.kind:
+            self.write_values(values)
+        self.rows += len(values)
+
+    def write_values(self, values):
+        if self.kind in TEXT_KINDS:
+            numbers = encode_text(self.kind, values)
+            if numbers is not None:
+                array("q", numbers).tofile(self.values_file)
+                return
+            self.store_as_strings()
+
+        typecode = COLUMN_KINDS[self.kind][1]
+        if self.kind == "string":
+            encoded = [b"" if value is None else value.encode("utf-8") for value in values]
+            ends = array(typecode)
+            for value in encoded:
+                self.string_end += len(value)
+                ends.append(self.string_end)
+            ends.tofile(self.values_file)
+            self.strings_file.write(b"".join(encoded))
+        elif self.kind == "dictionary":
+            dictionary = self.dictionary
+            array(typecode, [-1 if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]).tofile(self.values_file)
+        else:
+            array(typecode, map(ENCODERS[self.kind], values)).tofile(self.values_file)
+
+    def store_as_strings(self):
+        # Values that are not in the text kind of the column, the rows written so far are
+        # formatted back and the column is kept as strings from then on
+        self.values_file.close()
+        numbers = array("q")
+        with open(self.path + ".values", 'rb') as values_file:
+            numbers.frombytes(values_file.read())
+
+        texts = decode_text(self.kind, numbers.tolist())
+        self.kind = "string"
+        self.values_file = open(self.path + ".values", 'wb')
+        self.strings_file = open(self.path + ".strings", 'wb')
+        self.write_values(texts)
+
+    def close(self):
+        for file in [self.values_file, self.strings_file, self.nulls_file]:
+            if file:
+                file.close()
+
+    def description(self):
+        description = { "name": self.name, "kind": self.kind, "nulls": self.nulls_file is not None }
+        if self.kind == "dictionary":
+            description["dictionary"] = list(self.dictionary)
+        return description
+
+class SnapshotWriter:
+    # Collects the records of one table and writes them column by column, batch_size rows at a time.
+    # <table>.json describes the columns once the table is closed.
+
+    def __init__(self, directory, record_type, batch_size=DEFAULT_BATCH_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.table = record_type.table
+        self.columns = [SnapshotColumn(directory, record_type.table, column) for column in record_type._fields]
+        self.batch_size = batch_size
+        self.batch = []
+        self.rows = 0
+
+    def write(self, record):
+        self.batch.append(record)
+        self.rows += 1
+
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+
+        for column, values in zip(self.columns, zip(*self.batch)):
+            column.write(values)
+        self.batch.clear()
+
+    def close(self):
+        self.flush()
+        for column in self.columns:
+            column.close()
+
+        with open(os.path.join(self.directory, self.table + ".json"), 'w', encoding="utf-8") as table_file:
+            json.dump({ "rows": self.rows, "columns": [column.description() for column in self.columns] }, table_file)
+
+def write_snapshot(path, directories):
+    # Move the snapshot spools of directories into the snapshot directory path as its segments, in order
+    if os.path.exists(path):
+        if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            raise ValueError(path + " exists and is not a snapshot, it would be overwritten")
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    segments = []
+    for directory in directories:
+        segment = os.path.basename(directory)
+        shutil.move(os.path.join(directory, SNAPSHOT_SPOOL), os.path.join(path, segment))
+        segments.append(segment)
+
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding="utf-8") as manifest_file:
+        json.dump({ "version": SNAPSHOT_VERSION, "byteorder": sys.byteorder, "segments": segments }, manifest_file, indent=4)
+
+def map_file(path):
+    # Read-only map of a whole file, empty files cannot be mapped and are read as no bytes
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+class SnapshotReader:
+    # Records of a snapshot written by write_snapshot(), decoded straight from the mapped column files
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest["version"] != SNAPSHOT_VERSION:
+            raise ValueError("Snapshot " + path + " has version " + str(manifest["version"]) + ", expected " + str(SNAPSHOT_VERSION))
+        if manifest["byteorder"] != sys.byteorder:
+            raise ValueError("Snapshot " + path + " was written on a " + manifest["byteorder"] + " endian machine")
+
+        self.path = path
+        self.segments = manifest["segments"]
+
+    def table_description(self, segment, record_type):
+        path = os.path.join(self.path, segment, record_type.table + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding="utf-8") as table_file:
+            return json.load(table_file)
+
+    def records(self, record_type, segments=None):
+        # Records of one table of segments, all of them when not given, in the order they were written
+        for segment in segments if segments is not None else self.segments:
+            description = self.table_description(segment, record_type)
+            if description and description["rows"]:
+                yield from self.segment_records(segment, record_type, description)
+
+    def segment_records(self, segment, record_type, description):
+        rows = description["rows"]
+        prefix = os.path.join(self.path, segment, record_type.table + ".")
+        maps = []
+        views = []
+
+        def open_view(path, typecode=None):
+            mapped = map_file(path)
+            maps.append(mapped)
+            view = memoryview(mapped)
+            if typecode:
+                view = view.cast(typecode)
+            views.append(view)
+            return view
+
+        try:
+            readers = [self.column_reader(column, prefix + column["name"], open_view) for column in description["columns"]]
+            make = record_type._make
+            for start in range(0, rows, READ_BATCH_SIZE):
+                stop = min(start + READ_BATCH_SIZE, rows)
+                yield from map(make, zip(*[read(start, stop) for read in readers]))
+        finally:
+            # Views have to be let go of before their maps can be closed
+            for view in views:
+                view.release()
+            for mapped in maps:
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+
+    def column_reader(self, column, path, open_view):
+        # Function decoding the values of rows [start, stop) of a column
+        kind = column["kind"]
+        if kind is None:
+            return lambda start, stop: [None] * (stop - start)
+
+        values = open_view(path + ".values", COLUMN_KINDS[kind][1])
+        if kind == "string":
+            strings = open_view(path + ".strings")
+
+            def read(start, stop):
+                ends = values[start:stop].tolist()
+                first = values[start - 1] if start else 0
+                data = strings[first:ends[-1]].tobytes()
+                starts = [0] + [end - first for end in ends[:-1]]
+                text = data.decode("utf-8")
+                if len(text) == len(data):
+                    # Only ASCII, byte offsets are character offsets and the batch is decoded once
+                    return [text[begin:end - first] for begin, end in zip(starts, ends)]
+                return [data[begin:end - first].decode("utf-8") for begin, end in zip(starts, ends)]
+        elif kind == "dictionary":
+            # Code -1 is None, it finds the None added after the last value
+            dictionary = column["dictionary"] + [None]
+
+            def read(start, stop):
+                return [dictionary[code] for code in values[start:stop].tolist()]
+        elif kind in TEXT_KINDS:
+            def read(start, stop):
+                return decode_text(kind, values[start:stop].tolist())
+        else:
+            decoder = DECODERS[kind]
+
+            def read(start, stop):
+                decoded = values[start:stop].tolist()
+                return list(map(decoder, decoded)) if decoder else decoded
+
+        if not column["nulls"]:
+            return read
+
+        nulls = open_view(path + ".nulls")
+
+        def read_with_nulls(start, stop):
+            return [None if null else value for value, null in zip(read(start, stop), nulls[start:stop])]
+        return read_with_nulls
+
+# Stage reading the records of one segment of a snapshot, for sql_file_generator.write_stages()
+def read_snapshot_segment(reader, segment):
+    for record_type in RECORD_TYPES:
+        yield from reader.records(record_type, [segment])
@@ -0,0 +1,170 @@
+# Writes generated rows as multi-row INSERT statements of a limited size,
+# or as delimited data files for LOAD DATA INFILE
+
+from datetime import date, datetime, timedelta
+
+# Rows in one INSERT statement, small enough to stay far below max_allowed_packet
+DEFAULT_BATCH_SIZE = 1000
+
+# Size of the write buffer of every output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+class SQLExpression(str):
+    # Value that is written as it is, e.g. CURRENT_DATE()
+    pass
+
+class TimeFromNow(timedelta):
+    # Moment relative to the time the data is loaded, e.g. TimeFromNow(hours=1) for a token expiring in an hour
+    def seconds_from_now(self):
+        return str(self.days * 86400 + self.seconds)
+
+def quote_string(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+# SQL text of a value by its exact type
+VALUE_FORMATTERS = {
+    str: quote_string,
+    int: str,
+    float: str,
+    bool: lambda value: "true" if value else "false",
+    type(None): lambda value: "NULL",
+    SQLExpression: str,
+    TimeFromNow: lambda value: "DATE_ADD(NOW(), INTERVAL " + value.seconds_from_now() + " SECOND)",
+    date: lambda value: '"' + value.isoformat() + '"',
+    datetime: lambda value: '"' + value.isoformat(" ") + '"',
+}
+
+def format_value(value):
+    return VALUE_FORMATTERS[type(value)](value)
+
+def format_record(record):
+    return ", ".join([VALUE_FORMATTERS[type(value)](value) for value in record])
+
+def insert_header(record_type):
+    return "INSERT INTO `" + record_type.table + "` (`" + "`, `".join(record_type._fields) + "`) VALUES\n"
+
+class InsertWriter:
+    # Collects the records of one table and writes them in INSERT statements of batch_size rows
+
+    def __init__(self, file, record_type, batch_size=DEFAULT_BATCH_SIZE, use_transactions=False):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1, got " + str(batch_size))
+
+        self.file = file
+        self.header = insert_header(record_type)
+        self.batch_size = batch_size
+        self.use_transactions = use_transactions
+        self.batch = []
+        self.rows = 0
+        self.statements = 0
+
+    def write(self, record):
+        self.batch.append(format_record(record))
+        self.rows += 1
+
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+
+        statement = self.header + "(" + "),\n(".join(self.batch) + ");\n\n"
+        if self.use_transactions:
+            statement = "START TRANSACTION;\n" + statement + "COMMIT;\n\n"
+
+        self.file.write(statement)
+        self.batch.clear()
+        self.statements += 1
+
+    def close(self):
+        self.flush()
+
+# Delimited data files, read back by LOAD DATA INFILE with the clauses of DELIMITED_FORMATS.
+# NULL is \N, every other special character is escaped with a backslash.
+DELIMITED_FORMATS = {
+    "tsv": "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'",
+    "csv": "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'",
+}
+
+TSV_ESCAPES = str.maketrans({ "\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0" })
+CSV_ESCAPES = str.maketrans({ "\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\0": "\\0" })
+
+def cannot_delimit(value):
+    raise ValueError("SQL expression " + value + " cannot be written to a data file")
+
+def delimited_formatters(quote, escapes):
+    # Text of a value in a data file by its exact type, TimeFromNow is stored as seconds and turned
+    # into a date by the SET clause of the loader script
+    return {
+        str: lambda value: quote + value.translate(escapes) + quote,
+        int: str,
+        float: str,
+        bool: lambda value: "1" if value else "0",
+        type(None): lambda value: "\\N",
+        SQLExpression: cannot_delimit,
+        TimeFromNow: TimeFromNow.seconds_from_now,
+        date: date.isoformat,
+        datetime: lambda value: value.isoformat(" "),
+    }
+
+DELIMITED_VALUE_FORMATTERS = {
+    "tsv": ("\t", delimited_formatters("", TSV_ESCAPES)),
+    "csv": (",", delimited_formatters('"', CSV_ESCAPES)),
+}
+
+class DelimitedWriter:
+    # Writes the records of one table as lines of a data file, batch_size lines at a time
+
+    def __init__(self, file, record_type, batch_size=DEFAULT_BATCH_SIZE, file_format="tsv"):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1, got " + str(batch_size))
+        if file_format not in DELIMITED_VALUE_FORMATTERS:
+            raise ValueError("Unknown data file format " + file_format)
+
+        self.file = file
+        self.delimiter, self.formatters = DELIMITED_VALUE_FORMATTERS[file_format]
+        self.batch_size = batch_size
+        self.batch = []
+        self.rows = 0
+
+    def write(self, record):
+        formatters = self.formatters
+        self.batch.append(self.delimiter.join([formatters[type(value)](value) for value in record]))
+        self.rows += 1
+
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+
+        self.file.write("\n".join(self.batch) + "\n")
+        self.batch.clear()
+
+    def close(self):
+        self.flush()
+
+def load_data_statement(record_type, path, file_format):
+    # LOAD DATA statement of one data file, columns holding a TimeFromNow are read into variables
+    columns = []
+    assignments = []
+    for column in record_type._fields:
+        if column in record_type.load_time_columns:
+            columns.append("@" + column)
+            assignments.append("`" + column + "` = DATE_ADD(NOW(), INTERVAL @" + column + " SECOND)")
+        else:
+            columns.append("`" + column + "`")
+
+    statement = "LOAD DATA LOCAL INFILE '" + path + "'\n"
+    statement += "INTO TABLE `" + record_type.table + "`\n"
+    statement += "CHARACTER SET utf8mb4\n"
+    statement += DELIMITED_FORMATS[file_format] + "\n"
+    statement += "(" + ", ".join(columns) + ")"
+    if assignments:
+        statement += "\nSET " + ", ".join(assignments)
+    return statement + ";\n\n"
+
+def open_output_file(path):
+    return open(path, 'w', encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
@@ -0,0 +1,110 @@
+import random
+from datetime import date, timedelta
+
+# Samples dates and times by drawing ordinal offsets directly, so a value costs the
+# same whether the range is one day or ten years and no list of days is ever built.
+
+SECONDS_IN_DAY = 24 * 60 * 60
+SECONDS_IN_HOUR = 60 * 60
+
+# Relative number of transactions started in each hour of the day. Almost nothing
+# happens at night, activity grows through the morning, peaks around lunch and
+# again after work, then fades out in the evening.
+UNIFORM_HOURS = [1] * 24
+BANKING_HOURS = [
+    2, 1, 1, 1, 1, 2,        # 00 - 05
+    4, 9, 18, 28, 34, 38,    # 06 - 11
+    42, 38, 33, 31, 32, 36,  # 12 - 17
+    35, 28, 20, 13, 8, 4,    # 18 - 23
+]
+
+def cumulative_weights(weights):
+    result = []
+    total = 0
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+UNIFORM_HOURS_CUMULATIVE = cumulative_weights(UNIFORM_HOURS)
+BANKING_HOURS_CUMULATIVE = cumulative_weights(BANKING_HOURS)
+
+HOURS = range(24)
+SECONDS_IN_HOUR_RANGE = range(SECONDS_IN_HOUR)
+
+def format_date(day):
+    # Same text as the old generate_date_between(), e.g. 2022/01/05
+    return day.isoformat().replace('-', '/')
+
+def format_time(second_of_day):
+    # Same text as generate_random_time(), hours, minutes and seconds without padding, e.g. 9:5:30
+    hours, second = divmod(second_of_day, SECONDS_IN_HOUR)
+    minutes, second = divmod(second, 60)
+    return str(hours) + ":" + str(minutes) + ":" + str(second)
+
+def days_in_range(min_date, max_date):
+    days = (max_date - min_date).days + 1
+    if days < 1:
+        raise ValueError("Date range " + str(min_date) + " - " + str(max_date) + " is empty")
+    return days
+
+def sample_date(min_date, max_date):
+    # Uniform date of [min_date, max_date], both ends included
+    return min_date + timedelta(days=random.randrange(days_in_range(min_date, max_date)))
+
+def sample_dates(n, min_date, max_date):
+    first_day = min_date.toordinal()
+    return [date.fromordinal(first_day + offset) for offset in random.choices(range(days_in_range(min_date, max_date)), k=n)]
+
+def sample_seconds_of_day(n, hour_weights=BANKING_HOURS_CUMULATIVE):
+    # Hour is drawn from the cumulative hour weights, the moment inside of the hour is uniform
+    hours = random.choices(HOURS, cum_weights=hour_weights, k=n)
+    seconds = random.choices(SECONDS_IN_HOUR_RANGE, k=n)
+    return [hour * SECONDS_IN_HOUR + second for hour, second in zip(hours, seconds)]
+
+def sample_time(hour_weights=BANKING_HOURS_CUMULATIVE):
+    return format_time(sample_seconds_of_day(1, hour_weights)[0])
+
+def sample_times(n, hour_weights=BANKING_HOURS_CUMULATIVE):
+    return [format_time(second) for second in sample_seconds_of_day(n, hour_weights)]
+
+def sample_timestamps(n, min_date, max_date, hour_weights=BANKING_HOURS_CUMULATIVE):
+    # Whole column of "date time" values in the format of generate_date_between() + ' ' + generate_random_time()
+    days = sample_dates(n, min_date, max_date)
+    seconds = sample_seconds_of_day(n, hour_weights)
+    return [format_date(day) + " " + format_time(second) for day, second in zip(days, seconds)]
+
+def sample_times_on(n, day, hour_weights=BANKING_HOURS_CUMULATIVE):
+    # Whole column of "date time" values on one given day
+    prefix = format_date(day) + " "
+    return [prefix + format_time(second) for second in sample_seconds_of_day(n, hour_weights)]
+
+if __name__ == "__main__":
+    # Benchmark against the list based sampling that was used before
+    import timeit
+
+    def list_date_between(min_date, max_date):
+        tmp = [min_date + timedelta(days=i) for i in range((max_date-min_date).days + 1)]
+        return (str(random.choice(tmp)).replace('-','/'))
+
+    def list_random_time():
+        return (str(random.randint(0, 23)) + ":" + str(random.randint(0, 59)) + ":" + str(random.randint(0, 59)))
+
+    def report(name, seconds, count):
+        print(f"{ name:<40}{ seconds / count * 1e6:>10.2f} us per value")
+
+    count = 20000
+    for years in (1, 5):
+        min_date = date(2021, 11, 1)
+        max_date = min_date + timedelta(days=365 * years)
+        print(f"Range of { years } year(s)")
+        report("list date + uniform time", timeit.timeit(lambda: list_date_between(min_date, max_date) + ' ' + list_random_time(), number=count), count)
+        report("sample_date + sample_time", timeit.timeit(lambda: format_date(sample_date(min_date, max_date)) + ' ' + sample_time(), number=count), count)
+        report("sample_timestamps", timeit.timeit(lambda: sample_timestamps(count, min_date, max_date), number=1), count)
+
+    hours = [0] * 24
+    for second in sample_seconds_of_day(100000):
+        hours[second // SECONDS_IN_HOUR] += 1
+    print("Share of timestamps per hour:")
+    for hour in HOURS:
+        print(f"{ hour:02}  { hours[hour] / 1000:5.1f}% { '#' * (hours[hour] // 500) }")
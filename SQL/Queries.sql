@@ -356,7 +356,22 @@ final_table AS (
     FROM all_bargains
 )
 
-SELECT * from final_table 
+SELECT * from final_table;
+
+/*
+Total oustandings of bank from the running totals of account_flow_summary
+*/
+
+SELECT
+    SUM(account_flow_summary.incoming_amount) - SUM(account_flow_summary.outgoing_amount) AS total,
+    currency_list.symbol,
+    currency_list.alphabetic_code
+
+FROM account_flow_summary
+
+INNER JOIN currency_list ON currency_list.currency_ID = account_flow_summary.currency_ID
+
+GROUP BY account_flow_summary.currency_ID;
 
 /* #endregion */
 
@@ -117,7 +117,9 @@ CREATE TABLE IF NOT EXISTS bargain (
     bargain_status ENUM ("Waiting for Date", "Pending","Failed", "Succesful") NOT NULL DEFAULT "Waiting for Date",
     bargain_date DATETIME NOT NULL,
     bargain_description VARCHAR(255) NOT NULL,
-    FOREIGN KEY (currency_ID) REFERENCES currency_list(currency_ID)
+    FOREIGN KEY (currency_ID) REFERENCES currency_list(currency_ID),
+    -- Events look up bargains by status and date
+    INDEX bargain_status_date (bargain_status, bargain_date)
 );
 
 CREATE TABLE IF NOT EXISTS local_bargain (
@@ -150,6 +152,65 @@ CREATE TABLE IF NOT EXISTS outgoing_bargain (
     FOREIGN KEY (bargain_ID) REFERENCES bargain(bargain_ID)
 );
 
+-- Running totals of incoming and outgoing bargains of every account and currency, kept up to date by triggers
+CREATE TABLE IF NOT EXISTS account_flow_summary (
+    account_number BIGINT UNSIGNED NOT NULL,
+    currency_ID TINYINT UNSIGNED NOT NULL,
+    incoming_amount DECIMAL(25, 2) UNSIGNED NOT NULL DEFAULT 0,
+    outgoing_amount DECIMAL(25, 2) UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_number, currency_ID),
+    FOREIGN KEY (account_number) REFERENCES account(account_number),
+    FOREIGN KEY (currency_ID) REFERENCES currency_list(currency_ID)
+);
+
+-- Settled bargains and their subtype rows moved out of the live tables by archive_settled_bargains.
+-- InnoDB does not allow foreign keys on partitioned tables, so archive tables have none. Rows are only
+-- written by the archival, which copies them together with their parents.
+CREATE TABLE IF NOT EXISTS bargain_archive (
+    bargain_ID INT UNSIGNED NOT NULL,
+    amount DECIMAL(19, 2) UNSIGNED NOT NULL,
+    currency_ID TINYINT UNSIGNED NOT NULL,
+    bargain_status ENUM ("Waiting for Date", "Pending","Failed", "Succesful") NOT NULL,
+    bargain_date DATETIME NOT NULL,
+    bargain_description VARCHAR(255) NOT NULL,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- The partitioning column has to be part of every unique key
+    PRIMARY KEY (bargain_ID, bargain_date)
+)
+-- One partition per year, queries over a date range only read the years they need.
+-- Before p_future gets rows, split it with REORGANIZE PARTITION p_future INTO (p2027 ..., p_future ...)
+PARTITION BY RANGE COLUMNS (bargain_date) (
+    PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+    PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+    PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+CREATE TABLE IF NOT EXISTS local_bargain_archive (
+    bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY,
+    sender_account_number BIGINT UNSIGNED NOT NULL,
+    receiver_account_number BIGINT UNSIGNED NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS international_bargain_archive (
+    bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY,
+    sender_IBAN VARCHAR(34) NOT NULL,
+    receiver_IBAN VARCHAR(34) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS incoming_bargain_archive (
+    bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY,
+    receipt_date DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS outgoing_bargain_archive (
+    bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY,
+    planned_date DATETIME NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS stock (
     stock_code VARCHAR(5) NOT NULL PRIMARY KEY, -- AAPL
     stock_name VARCHAR(50) NOT NULL UNIQUE, -- Apple
@@ -202,7 +263,22 @@ CREATE TABLE IF NOT EXISTS customer_sessions (
     token_salt CHAR(64) NOT NULL UNIQUE,
     token_hashed VARCHAR(128) NOT NULL,
     token_expiry_date DATETIME NOT NULL,
-    FOREIGN KEY (reference_number) REFERENCES client_details(reference_number)
+    FOREIGN KEY (reference_number) REFERENCES client_details(reference_number),
+    -- Sessions are validated by their token, live sessions of a customer are found by reference number
+    -- and expired sessions are purged by their expiry date
+    INDEX customer_sessions_token (token_hashed),
+    INDEX customer_sessions_reference_expiry (reference_number, token_expiry_date),
+    INDEX customer_sessions_expiry (token_expiry_date)
+);
+
+-- Rows handled by every run of an event and how long the run took
+CREATE TABLE IF NOT EXISTS event_log (
+    event_log_ID BIGINT UNSIGNED NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    event_name VARCHAR(64) NOT NULL,
+    started_at DATETIME(6) NOT NULL,
+    rows_affected INT UNSIGNED NOT NULL,
+    duration_microseconds BIGINT UNSIGNED NOT NULL,
+    INDEX event_log_name_start (event_name, started_at)
 );
 
 -- USED FOR DEBUGGING PROCEDURES AND FUNCTIONS
@@ -290,6 +366,8 @@ GRANT SELECT (account_number, stock_code) ON banking_system.account_stock TO 'ba
 GRANT SELECT (card_ID, internet_shopping_available, frozen) ON banking_system.card_details TO 'bank_auditor';
 GRANT SELECT ON banking_system.card_daily_limit TO 'bank_auditor';
 GRANT SELECT ON banking_system.account_card TO 'bank_auditor';
+GRANT SELECT ON banking_system.account_flow_summary TO 'bank_auditor';
+GRANT SELECT ON banking_system.bargain_archive TO 'bank_auditor';
 
 GRANT SELECT ON banking_system.view_user_accounts TO 'bank_auditor';
 GRANT SELECT ON banking_system.view_account_balance TO 'bank_auditor';
@@ -493,11 +571,392 @@ DELIMITER ;
 
 /* #endregion */
 
+/* #region PROMOTE WAITING BARGAINS */
+
+-- Procedure which changes the status of due "Waiting for Date" bargains to "Pending", oldest first and at most
+-- max_bargains in one run. Due bargains are one range of the bargain_status_date index. A bargain is due when
+-- it is planned less than a minute from now, as TIMESTAMPDIFF(MINUTE, NOW(), bargain_date) <= 0 was before.
+-- Every run is written to event_log.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE promote_waiting_bargains(IN max_bargains INT UNSIGNED)
+SQL SECURITY INVOKER
+BEGIN
+    DECLARE run_start DATETIME(6) DEFAULT NOW(6);
+    DECLARE promoted INT UNSIGNED DEFAULT 0;
+
+    UPDATE banking_system.bargain
+    SET bargain_status = "Pending"
+    WHERE bargain_status = "Waiting for Date" AND bargain_date < NOW() + INTERVAL 1 MINUTE
+    ORDER BY bargain_date
+    LIMIT max_bargains;
+
+    SET promoted = ROW_COUNT();
+
+    INSERT INTO banking_system.event_log (event_name, started_at, rows_affected, duration_microseconds)
+    VALUES ("check_for_waiting_bargains", run_start, promoted, TIMESTAMPDIFF(MICROSECOND, run_start, NOW(6)));
+END;
+//
+DELIMITER ;
+
+/* #endregion */
+
+/* #region SETTLE PENDING BARGAINS */
+
+-- Procedure which performs "Pending" bargains in chunks of at most chunk_size bargains, one transaction per chunk.
+-- Does the same as perform_bargain for every bargain, but set based: senders and receivers of local and
+-- international bargains are found with one join, every balance is changed once per chunk by the net amount
+-- of its account and currency, statuses and incoming bargains are written in bulk.
+-- Stops after max_chunks chunks, so one run ends before the next one starts, the rest waits for the next run.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE settle_pending_bargains(IN chunk_size INT UNSIGNED, IN max_chunks INT UNSIGNED)
+SQL SECURITY INVOKER
+BEGIN
+    DECLARE settled_in_chunk INT UNSIGNED DEFAULT 0;
+    DECLARE chunks INT UNSIGNED DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        DO RELEASE_LOCK('banking_system.settle_pending_bargains');
+        RESIGNAL;
+    END;
+
+    -- Only one settlement at a time, a run still working on a backlog is not joined by the next one
+    IF GET_LOCK('banking_system.settle_pending_bargains', 0) = 1 THEN
+
+        -- Bargains of the current chunk with their sender and receiver account, NULL if not found
+        CREATE OR REPLACE TEMPORARY TABLE settlement_chunk (
+            bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY,
+            amount DECIMAL(19, 2) UNSIGNED NOT NULL,
+            currency_ID TINYINT UNSIGNED NOT NULL,
+            sender_account_number BIGINT UNSIGNED,
+            receiver_account_number BIGINT UNSIGNED
+        ) ENGINE = MEMORY;
+
+        -- Net change of every balance in the current chunk
+        CREATE OR REPLACE TEMPORARY TABLE settlement_balance_change (
+            account_number BIGINT UNSIGNED NOT NULL,
+            currency_ID TINYINT UNSIGNED NOT NULL,
+            amount_change DECIMAL(19, 2) NOT NULL,
+            PRIMARY KEY (account_number, currency_ID)
+        ) ENGINE = MEMORY;
+
+        REPEAT
+            START TRANSACTION;
+
+            DELETE FROM settlement_chunk;
+            DELETE FROM settlement_balance_change;
+
+            -- Local bargains first, as perform_bargain, then international ones through their IBANs
+            INSERT INTO settlement_chunk (bargain_ID, amount, currency_ID, sender_account_number, receiver_account_number)
+            SELECT bargain.bargain_ID, bargain.amount, bargain.currency_ID,
+                IF(local_bargain.bargain_ID IS NULL, sender_IBAN.account_number, local_bargain.sender_account_number),
+                IF(local_bargain.bargain_ID IS NULL, receiver_IBAN.account_number, local_bargain.receiver_account_number)
+            FROM banking_system.bargain
+            LEFT JOIN banking_system.local_bargain ON local_bargain.bargain_ID = bargain.bargain_ID
+            LEFT JOIN banking_system.international_bargain ON international_bargain.bargain_ID = bargain.bargain_ID
+            LEFT JOIN banking_system.account_IBAN AS sender_IBAN ON sender_IBAN.IBAN = international_bargain.sender_IBAN
+            LEFT JOIN banking_system.account_IBAN AS receiver_IBAN ON receiver_IBAN.IBAN = international_bargain.receiver_IBAN
+            WHERE bargain.bargain_status = "Pending"
+            ORDER BY bargain.bargain_ID
+            LIMIT chunk_size;
+
+            SET settled_in_chunk = ROW_COUNT();
+
+            -- Money leaves senders and reaches receivers, only of bargains with both accounts
+            INSERT INTO settlement_balance_change (account_number, currency_ID, amount_change)
+            SELECT sender_account_number, currency_ID, -SUM(amount)
+            FROM settlement_chunk
+            WHERE sender_account_number IS NOT NULL AND receiver_account_number IS NOT NULL
+            GROUP BY sender_account_number, currency_ID;
+
+            INSERT INTO settlement_balance_change (account_number, currency_ID, amount_change)
+            SELECT receiver_account_number, currency_ID, SUM(amount)
+            FROM settlement_chunk
+            WHERE sender_account_number IS NOT NULL AND receiver_account_number IS NOT NULL
+            GROUP BY receiver_account_number, currency_ID
+            ON DUPLICATE KEY UPDATE amount_change = settlement_balance_change.amount_change + VALUES(amount_change);
+
+            UPDATE banking_system.account_balance
+            INNER JOIN settlement_balance_change ON settlement_balance_change.account_number = account_balance.account_number
+                AND settlement_balance_change.currency_ID = account_balance.currency_ID
+            SET account_balance.amount = account_balance.amount + settlement_balance_change.amount_change;
+
+            -- Bargains without a sender or receiver fail, the rest succeed and are received now
+            UPDATE banking_system.bargain
+            INNER JOIN settlement_chunk ON settlement_chunk.bargain_ID = bargain.bargain_ID
+            SET bargain.bargain_status = IF(settlement_chunk.sender_account_number IS NULL OR settlement_chunk.receiver_account_number IS NULL, "Failed", "Succesful");
+
+            INSERT INTO banking_system.incoming_bargain (bargain_ID, receipt_date)
+            SELECT bargain_ID, CURRENT_TIMESTAMP
+            FROM settlement_chunk
+            WHERE sender_account_number IS NOT NULL AND receiver_account_number IS NOT NULL;
+
+            COMMIT;
+            SET chunks = chunks + 1;
+        UNTIL settled_in_chunk < chunk_size OR chunks >= max_chunks END REPEAT;
+
+        DROP TEMPORARY TABLE settlement_chunk;
+        DROP TEMPORARY TABLE settlement_balance_change;
+        DO RELEASE_LOCK('banking_system.settle_pending_bargains');
+    END IF;
+END;
+//
+DELIMITER ;
+
+/* #endregion */
+
+/* #region ACCOUNT FLOW SUMMARY */
+
+-- Procedure which fills account_flow_summary again from the whole bargain history, e.g. after data was loaded
+-- before the table existed. Incoming bargains count for their receiver and outgoing bargains for their sender,
+-- local ones by account number and international ones through the IBAN of an account of this bank.
+-- Archived bargains are added on top of the live ones, so the totals do not change when bargains are archived.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE rebuild_account_flow_summary()
+SQL SECURITY INVOKER
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    START TRANSACTION;
+
+    DELETE FROM banking_system.account_flow_summary;
+
+    INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, incoming_amount)
+    SELECT receiver.account_number, bargain.currency_ID, SUM(bargain.amount)
+    FROM banking_system.incoming_bargain
+    INNER JOIN banking_system.bargain ON bargain.bargain_ID = incoming_bargain.bargain_ID
+    INNER JOIN (
+        SELECT bargain_ID, receiver_account_number AS account_number FROM banking_system.local_bargain
+        UNION ALL
+        SELECT international_bargain.bargain_ID, account_IBAN.account_number
+        FROM banking_system.international_bargain
+        INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain.receiver_IBAN
+    ) AS receiver ON receiver.bargain_ID = bargain.bargain_ID
+    GROUP BY receiver.account_number, bargain.currency_ID;
+
+    INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, outgoing_amount)
+    SELECT sender.account_number, bargain.currency_ID, SUM(bargain.amount)
+    FROM banking_system.outgoing_bargain
+    INNER JOIN banking_system.bargain ON bargain.bargain_ID = outgoing_bargain.bargain_ID
+    INNER JOIN (
+        SELECT bargain_ID, sender_account_number AS account_number FROM banking_system.local_bargain
+        UNION ALL
+        SELECT international_bargain.bargain_ID, account_IBAN.account_number
+        FROM banking_system.international_bargain
+        INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain.sender_IBAN
+    ) AS sender ON sender.bargain_ID = bargain.bargain_ID
+    GROUP BY sender.account_number, bargain.currency_ID
+    ON DUPLICATE KEY UPDATE outgoing_amount = VALUES(outgoing_amount);
+
+    INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, incoming_amount)
+    SELECT receiver.account_number, bargain_archive.currency_ID, SUM(bargain_archive.amount)
+    FROM banking_system.incoming_bargain_archive
+    INNER JOIN banking_system.bargain_archive ON bargain_archive.bargain_ID = incoming_bargain_archive.bargain_ID
+    INNER JOIN (
+        SELECT bargain_ID, receiver_account_number AS account_number FROM banking_system.local_bargain_archive
+        UNION ALL
+        SELECT international_bargain_archive.bargain_ID, account_IBAN.account_number
+        FROM banking_system.international_bargain_archive
+        INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain_archive.receiver_IBAN
+    ) AS receiver ON receiver.bargain_ID = bargain_archive.bargain_ID
+    GROUP BY receiver.account_number, bargain_archive.currency_ID
+    ON DUPLICATE KEY UPDATE incoming_amount = account_flow_summary.incoming_amount + VALUES(incoming_amount);
+
+    INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, outgoing_amount)
+    SELECT sender.account_number, bargain_archive.currency_ID, SUM(bargain_archive.amount)
+    FROM banking_system.outgoing_bargain_archive
+    INNER JOIN banking_system.bargain_archive ON bargain_archive.bargain_ID = outgoing_bargain_archive.bargain_ID
+    INNER JOIN (
+        SELECT bargain_ID, sender_account_number AS account_number FROM banking_system.local_bargain_archive
+        UNION ALL
+        SELECT international_bargain_archive.bargain_ID, account_IBAN.account_number
+        FROM banking_system.international_bargain_archive
+        INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain_archive.sender_IBAN
+    ) AS sender ON sender.bargain_ID = bargain_archive.bargain_ID
+    GROUP BY sender.account_number, bargain_archive.currency_ID
+    ON DUPLICATE KEY UPDATE outgoing_amount = account_flow_summary.outgoing_amount + VALUES(outgoing_amount);
+
+    COMMIT;
+END;
+//
+DELIMITER ;
+
+/* #endregion */
+
+/* #region ARCHIVE SETTLED BARGAINS */
+
+-- Procedure which moves "Succesful" and "Failed" bargains dated more than retention_days ago, with their local,
+-- international, incoming and outgoing rows, to the archive tables. Bargains are moved in batches of batch_size,
+-- one transaction per batch, and at most max_batches batches in one run. The bargains of a batch are two ranges
+-- of the bargain_status_date index. Every run is written to event_log.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE archive_settled_bargains(IN retention_days INT UNSIGNED, IN batch_size INT UNSIGNED, IN max_batches INT UNSIGNED)
+SQL SECURITY INVOKER
+BEGIN
+    DECLARE run_start DATETIME(6) DEFAULT NOW(6);
+    DECLARE archive_before DATETIME DEFAULT NOW() - INTERVAL retention_days DAY;
+    DECLARE archived_in_batch INT UNSIGNED DEFAULT 0;
+    DECLARE archived INT UNSIGNED DEFAULT 0;
+    DECLARE batches INT UNSIGNED DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        DO RELEASE_LOCK('banking_system.archive_settled_bargains');
+        RESIGNAL;
+    END;
+
+    -- Only one archival at a time
+    IF GET_LOCK('banking_system.archive_settled_bargains', 0) = 1 THEN
+
+        -- IDs of the bargains moved in the current batch
+        CREATE OR REPLACE TEMPORARY TABLE archive_batch (
+            bargain_ID INT UNSIGNED NOT NULL PRIMARY KEY
+        ) ENGINE = MEMORY;
+
+        REPEAT
+            START TRANSACTION;
+
+            DELETE FROM archive_batch;
+
+            INSERT INTO archive_batch (bargain_ID)
+            SELECT bargain_ID
+            FROM banking_system.bargain
+            WHERE bargain_status IN ("Succesful", "Failed") AND bargain_date < archive_before
+            LIMIT batch_size;
+
+            SET archived_in_batch = ROW_COUNT();
+
+            -- Copy the bargains and their subtype rows
+            INSERT INTO banking_system.bargain_archive (bargain_ID, amount, currency_ID, bargain_status, bargain_date, bargain_description)
+            SELECT bargain.bargain_ID, bargain.amount, bargain.currency_ID, bargain.bargain_status, bargain.bargain_date, bargain.bargain_description
+            FROM banking_system.bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = bargain.bargain_ID;
+
+            INSERT INTO banking_system.local_bargain_archive (bargain_ID, sender_account_number, receiver_account_number)
+            SELECT local_bargain.bargain_ID, local_bargain.sender_account_number, local_bargain.receiver_account_number
+            FROM banking_system.local_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = local_bargain.bargain_ID;
+
+            INSERT INTO banking_system.international_bargain_archive (bargain_ID, sender_IBAN, receiver_IBAN)
+            SELECT international_bargain.bargain_ID, international_bargain.sender_IBAN, international_bargain.receiver_IBAN
+            FROM banking_system.international_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = international_bargain.bargain_ID;
+
+            INSERT INTO banking_system.incoming_bargain_archive (bargain_ID, receipt_date)
+            SELECT incoming_bargain.bargain_ID, incoming_bargain.receipt_date
+            FROM banking_system.incoming_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = incoming_bargain.bargain_ID;
+
+            INSERT INTO banking_system.outgoing_bargain_archive (bargain_ID, planned_date)
+            SELECT outgoing_bargain.bargain_ID, outgoing_bargain.planned_date
+            FROM banking_system.outgoing_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = outgoing_bargain.bargain_ID;
+
+            -- Remove them from the live tables, subtype rows first because of their foreign keys
+            DELETE local_bargain FROM banking_system.local_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = local_bargain.bargain_ID;
+
+            DELETE international_bargain FROM banking_system.international_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = international_bargain.bargain_ID;
+
+            DELETE incoming_bargain FROM banking_system.incoming_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = incoming_bargain.bargain_ID;
+
+            DELETE outgoing_bargain FROM banking_system.outgoing_bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = outgoing_bargain.bargain_ID;
+
+            DELETE bargain FROM banking_system.bargain
+            INNER JOIN archive_batch ON archive_batch.bargain_ID = bargain.bargain_ID;
+
+            COMMIT;
+            SET archived = archived + archived_in_batch;
+            SET batches = batches + 1;
+        UNTIL archived_in_batch < batch_size OR batches >= max_batches END REPEAT;
+
+        DROP TEMPORARY TABLE archive_batch;
+
+        INSERT INTO banking_system.event_log (event_name, started_at, rows_affected, duration_microseconds)
+        VALUES ("archive_old_bargains", run_start, archived, TIMESTAMPDIFF(MICROSECOND, run_start, NOW(6)));
+
+        DO RELEASE_LOCK('banking_system.archive_settled_bargains');
+    END IF;
+END;
+//
+DELIMITER ;
+
+/* #endregion */
+
+/* #region CUSTOMER SESSIONS */
+
+-- Procedure which returns the session of a customer with the given hashed token if it has not expired yet,
+-- no rows if the token is unknown, belongs to another customer or has expired. One lookup of the
+-- customer_sessions_token index.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE validate_customer_session(IN session_reference_number CHAR(12), IN session_token_hashed VARCHAR(128))
+SQL SECURITY INVOKER
+BEGIN
+    SELECT session_UUID, reference_number, token_expiry_date
+    FROM banking_system.customer_sessions
+    WHERE token_hashed = session_token_hashed
+        AND reference_number = session_reference_number
+        AND token_expiry_date > NOW();
+END;
+//
+DELIMITER ;
+
+-- Procedure which deletes expired sessions, at most batch_size in one statement and at most max_batches
+-- statements in one run. Every batch commits on its own, so no lock is held for long. Every run is written to event_log.
+
+DELIMITER //
+CREATE OR REPLACE PROCEDURE purge_expired_sessions(IN batch_size INT UNSIGNED, IN max_batches INT UNSIGNED)
+SQL SECURITY INVOKER
+BEGIN
+    DECLARE run_start DATETIME(6) DEFAULT NOW(6);
+    DECLARE purged_in_batch INT UNSIGNED DEFAULT 0;
+    DECLARE purged INT UNSIGNED DEFAULT 0;
+    DECLARE batches INT UNSIGNED DEFAULT 0;
+
+    REPEAT
+        START TRANSACTION;
+
+        -- One range of the customer_sessions_expiry index
+        DELETE FROM banking_system.customer_sessions
+        WHERE token_expiry_date < NOW()
+        ORDER BY token_expiry_date
+        LIMIT batch_size;
+
+        SET purged_in_batch = ROW_COUNT();
+        COMMIT;
+
+        SET purged = purged + purged_in_batch;
+        SET batches = batches + 1;
+    UNTIL purged_in_batch < batch_size OR batches >= max_batches END REPEAT;
+
+    INSERT INTO banking_system.event_log (event_name, started_at, rows_affected, duration_microseconds)
+    VALUES ("check_for_expired_sessions", run_start, purged, TIMESTAMPDIFF(MICROSECOND, run_start, NOW(6)));
+END;
+//
+DELIMITER ;
+
+/* #endregion */
+
 /* #endregion */
 
 /* #region TRIGGERS */
 
--- When user account status changes to OPEN, make income transaction of 50 GBP to new acccount
+-- When user account status changes to OPEN, make income transaction of 50 GBP to new acccount.
+-- The bargain ID comes from AUTO_INCREMENT, so accounts opened at the same time never get the same ID.
 DELIMITER //
 
 CREATE OR REPLACE TRIGGER `account_status_change_to_open`
@@ -505,12 +964,13 @@ AFTER UPDATE ON banking_system.account FOR EACH ROW
 BEGIN
     DECLARE new_bargain_ID INT UNSIGNED;
     
-    IF NEW.account_status = 'OPEN' THEN
-        SET new_bargain_ID = (SELECT MAX(bargain_ID) FROM banking_system.bargain) + 1;
-
+    -- Only when the account is opened, not when an open account is updated again
+    IF NEW.account_status = 'OPEN' AND OLD.account_status <> NEW.account_status THEN
         -- Create new bargain record
-        INSERT INTO banking_system.bargain (bargain_ID, amount, currency_ID, bargain_status, bargain_date, bargain_description)
-        VALUES (new_bargain_ID, 50, 3, 'Waiting', CURRENT_TIMESTAMP, 'Opening account');
+        INSERT INTO banking_system.bargain (amount, currency_ID, bargain_status, bargain_date, bargain_description)
+        VALUES (50, 3, 'Waiting for Date', CURRENT_TIMESTAMP, 'Opening account');
+
+        SET new_bargain_ID = LAST_INSERT_ID();
 
         -- Create local bargain record
         INSERT INTO banking_system.local_bargain (bargain_ID, sender_account_number, receiver_account_number)
@@ -524,86 +984,97 @@ END; //
 
 DELIMITER ;
 
+-- When a bargain is received, add its amount to the incoming total of the receiver account
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER `account_flow_incoming`
+AFTER INSERT ON banking_system.incoming_bargain FOR EACH ROW
+BEGIN
+    DECLARE flow_account_number BIGINT UNSIGNED;
+
+    -- Local bargains by account number, international ones through the IBAN of the receiver
+    SET flow_account_number = COALESCE(
+        (SELECT receiver_account_number FROM banking_system.local_bargain WHERE bargain_ID = NEW.bargain_ID),
+        (SELECT account_IBAN.account_number FROM banking_system.international_bargain
+            INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain.receiver_IBAN
+            WHERE international_bargain.bargain_ID = NEW.bargain_ID)
+    );
+
+    IF flow_account_number IS NOT NULL THEN
+        INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, incoming_amount)
+        SELECT flow_account_number, currency_ID, amount FROM banking_system.bargain WHERE bargain_ID = NEW.bargain_ID
+        ON DUPLICATE KEY UPDATE incoming_amount = account_flow_summary.incoming_amount + VALUES(incoming_amount);
+    END IF;
+END; //
+
+DELIMITER ;
+
+-- When an outgoing bargain is made, add its amount to the outgoing total of the sender account
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER `account_flow_outgoing`
+AFTER INSERT ON banking_system.outgoing_bargain FOR EACH ROW
+BEGIN
+    DECLARE flow_account_number BIGINT UNSIGNED;
+
+    -- Local bargains by account number, international ones through the IBAN of the sender
+    SET flow_account_number = COALESCE(
+        (SELECT sender_account_number FROM banking_system.local_bargain WHERE bargain_ID = NEW.bargain_ID),
+        (SELECT account_IBAN.account_number FROM banking_system.international_bargain
+            INNER JOIN banking_system.account_IBAN ON account_IBAN.IBAN = international_bargain.sender_IBAN
+            WHERE international_bargain.bargain_ID = NEW.bargain_ID)
+    );
+
+    IF flow_account_number IS NOT NULL THEN
+        INSERT INTO banking_system.account_flow_summary (account_number, currency_ID, outgoing_amount)
+        SELECT flow_account_number, currency_ID, amount FROM banking_system.bargain WHERE bargain_ID = NEW.bargain_ID
+        ON DUPLICATE KEY UPDATE outgoing_amount = account_flow_summary.outgoing_amount + VALUES(outgoing_amount);
+    END IF;
+END; //
+
+DELIMITER ;
+
 /* #endregion */
 
 /* #region EVENTS */
 
--- Check for any transactions that are with status "Waiting" 
+-- Move due "Waiting for Date" bargains to "Pending", at most 50000 a run
 DELIMITER //
 
 CREATE OR REPLACE EVENT check_for_waiting_bargains
 ON SCHEDULE EVERY 1 MINUTE DO
 BEGIN
-	DECLARE current_bargain_ID INT UNSIGNED;
-    DECLARE current_planned_date DATETIME;
-    DECLARE minute_difference BIGINT;
-    DECLARE done BOOLEAN DEFAULT FALSE;
-
-    -- Get list of all "Waiting" bargains
-    DECLARE bargain_waiting_list CURSOR FOR SELECT bargain_ID, bargain_date FROM banking_system.bargain WHERE bargain_status = "Waiting for Date";
-    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
-    
-    OPEN bargain_waiting_list;
-    
-    -- Foreach loop
-    bargain_read:LOOP
-
-        -- Save bargain values
-    	FETCH NEXT FROM bargain_waiting_list INTO current_bargain_ID, current_planned_date;
-        
-        -- NOT FOUND exception
-        IF (done) THEN
-        	LEAVE bargain_read;
-        END IF;
-        
-        -- Calculate time difference in minutes
-        SET minute_difference = TIMESTAMPDIFF(MINUTE, NOW(), current_planned_date);
-		
-        IF minute_difference <= 0 THEN
-            CALL change_bargain_status_to_pending(current_bargain_ID);
-        END IF;
-    END LOOP;
-    
-    CLOSE bargain_waiting_list;
-    
+    CALL banking_system.promote_waiting_bargains(50000);
 END; //
 
 DELIMITER ;
 
--- Check if any bargains are pending and perform them
+-- Check if any bargains are pending and perform them, in chunks of 10000 bargains and at most 50 chunks a run
 DELIMITER //
 CREATE OR REPLACE EVENT check_for_pending_bargains
 ON SCHEDULE EVERY 1 MINUTE DO
 BEGIN
-    DECLARE current_bargain_ID INT UNSIGNED;
-    DECLARE current_bargain_status ENUM ("Waiting for Date", "Pending","Failed", "Succesful");
-    DECLARE current_bargain_currency_ID TINYINT UNSIGNED;
-    DECLARE current_bargain_amount INT UNSIGNED;
-    DECLARE done BOOLEAN DEFAULT FALSE;
-
-    -- Get list of all "Pending" bargains
-    DECLARE bargain_waiting_list CURSOR FOR SELECT bargain_ID, amount, currency_ID, bargain_status FROM banking_system.bargain WHERE bargain_status = "Pending";
-    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
-
-    OPEN bargain_waiting_list;
-
-    -- Foreach loop
-    bargain_read:LOOP
+    CALL banking_system.settle_pending_bargains(10000, 50);
+END; //
 
-        -- Save bargain values
-    	FETCH NEXT FROM bargain_waiting_list INTO current_bargain_ID, current_bargain_amount, current_bargain_currency_ID, current_bargain_status;
-        
-        -- NOT FOUND exception
-        IF done THEN
-        	LEAVE bargain_read;
-        END IF;
+DELIMITER ;
 
-        -- Perform bargain
-        CALL perform_bargain(current_bargain_status, current_bargain_currency_ID, current_bargain_ID, current_bargain_amount);
-    END LOOP;
+-- Move settled bargains older than 90 days to the archive tables, in batches of 10000 and at most 100 batches a run
+DELIMITER //
+CREATE OR REPLACE EVENT archive_old_bargains
+ON SCHEDULE EVERY 1 HOUR DO
+BEGIN
+    CALL banking_system.archive_settled_bargains(90, 10000, 100);
+END; //
 
-    CLOSE bargain_waiting_list;
+DELIMITER ;
 
+-- Delete expired sessions, in batches of 1000 and at most 100 batches a run
+DELIMITER //
+CREATE OR REPLACE EVENT check_for_expired_sessions
+ON SCHEDULE EVERY 5 MINUTE DO
+BEGIN
+    CALL banking_system.purge_expired_sessions(1000, 100);
 END; //
 
 DELIMITER ;
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The generator is a directory of scripts importing each other by name, as they run from PY/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PY"))
@@ -0,0 +1,52 @@
+import gzip
+import pytest
+from compression import CompressedOutputFile, join_compressed_files, member_sizes, read_index, read_range
+
+def write_compressed(path, compression, lines):
+    with CompressedOutputFile(str(path), compression, block_size=1000, threads=2) as output:
+        for line in lines:
+            output.write(line)
+    return "".join(lines).encode("utf-8")
+
+@pytest.fixture(params=["gzip", "zstd"])
+def compression(request):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    return request.param
+
+def test_members_are_indexed(tmp_path, compression):
+    path = tmp_path / "data.sql"
+    text = write_compressed(path, compression, ["line " + str(number) + " é\n" for number in range(2000)])
+
+    index = read_index(str(path))
+    assert index["compression"] == compression
+    assert index["uncompressed_size"] == len(text)
+    assert index["compressed_size"] == path.stat().st_size
+    assert len(index["members"]) > 10
+    assert sum(size for _, size in member_sizes(str(path))) == len(text)
+
+    if compression == "gzip":
+        assert gzip.decompress(path.read_bytes()) == text
+
+@pytest.mark.parametrize("offset, length", [(0, 10), (995, 10), (1000, 1000), (5000, 20000), (0, 10 ** 6)])
+def test_read_range_matches_the_text(tmp_path, compression, offset, length):
+    path = tmp_path / "data.sql"
+    text = write_compressed(path, compression, ["row " + str(number) + "\n" for number in range(3000)])
+    assert read_range(str(path), offset, length) == text[offset:offset + length]
+
+def test_joined_files_keep_their_members(tmp_path, compression):
+    paths = [tmp_path / ("part" + str(number)) for number in range(3)]
+    texts = [write_compressed(path, compression, [str(number) * 7 + "\n" for _ in range(500)]) for number, path in enumerate(paths)]
+    joined = tmp_path / "joined"
+    join_compressed_files([str(path) for path in paths], str(joined), compression)
+
+    text = b"".join(texts)
+    assert member_sizes(str(joined)) == sum([member_sizes(str(path)) for path in paths], [])
+    assert read_range(str(joined), len(texts[0]) - 5, 10) == text[len(texts[0]) - 5:len(texts[0]) + 5]
+    assert read_range(str(joined), 0, len(text)) == text
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.sql"
+    write_compressed(path, "gzip", [])
+    assert read_index(str(path))["members"] == []
+    assert read_range(str(path), 0, 10) == b""
@@ -0,0 +1,32 @@
+import sqlite3
+import pytest
+from db_loader import BulkLoader, SQLiteBackend, TableLoadReport
+
+def foreign_keys(connection):
+    return connection.execute("PRAGMA foreign_keys").fetchone()[0]
+
+def test_validate_turns_checks_back_on_when_a_query_fails(tmp_path):
+    loader = BulkLoader(SQLiteBackend(str(tmp_path / "staging.db")), pool_size=2, disable_checks=True)
+    try:
+        assert [foreign_keys(connection) for connection in loader.pool.connections] == [0, 0]
+        loader.violations = lambda tables: [("missing", "SELECT COUNT(*) FROM no_such_table")]
+
+        with pytest.raises(sqlite3.OperationalError):
+            loader.validate()
+        assert [foreign_keys(connection) for connection in loader.pool.connections] == [1, 1]
+    finally:
+        loader.close()
+
+def test_validate_finds_rows_breaking_a_foreign_key(tmp_path):
+    loader = BulkLoader(SQLiteBackend(str(tmp_path / "staging.db")), pool_size=1, disable_checks=True)
+    try:
+        with loader.pool.connection() as connection:
+            connection.execute("INSERT INTO account_IBAN (account_number, IBAN) VALUES (1, 'GB0228189000000000000001')")
+            connection.commit()
+        loader.reports.append(TableLoadReport("account_IBAN", 1, 0.0))
+
+        with pytest.raises(ValueError, match="account_IBAN"):
+            loader.validate()
+        assert foreign_keys(loader.pool.connections[0]) == 1
+    finally:
+        loader.close()
@@ -0,0 +1,39 @@
+import pytest
+from id_allocator import UniqueIdAllocator
+
+@pytest.mark.parametrize("space_size", [1, 2, 3, 5, 16, 17, 1000, 4 ** 5, 4 ** 5 + 1])
+def test_every_identifier_is_handed_out_once(space_size):
+    # Sizes just above a power of 4 make the Feistel domain about 4 times the space, the most cycle walking
+    allocator = UniqueIdAllocator(space_size, seed=11)
+    identifiers = [allocator.allocate() for _ in range(space_size)]
+    assert sorted(identifiers) == list(range(space_size))
+    assert allocator.remaining() == 0
+
+    with pytest.raises(ValueError):
+        allocator.allocate()
+
+def test_same_seed_gives_the_same_order():
+    assert [UniqueIdAllocator(1000, seed=5).at(index) for index in range(50)] == [UniqueIdAllocator(1000, seed=5).at(index) for index in range(50)]
+    assert [UniqueIdAllocator(1000, seed=5).at(index) for index in range(50)] != [UniqueIdAllocator(1000, seed=6).at(index) for index in range(50)]
+
+def test_set_seed_starts_over():
+    allocator = UniqueIdAllocator(100, seed=2)
+    first = [allocator.allocate() for _ in range(10)]
+    allocator.set_seed(2)
+    assert [allocator.allocate() for _ in range(10)] == first
+
+def test_index_outside_of_the_space():
+    allocator = UniqueIdAllocator(10, seed=1)
+    with pytest.raises(IndexError):
+        allocator.at(10)
+    with pytest.raises(IndexError):
+        allocator.at(-1)
+    with pytest.raises(ValueError):
+        UniqueIdAllocator(0)
+
+def test_check_capacity():
+    allocator = UniqueIdAllocator(10, seed=1)
+    allocator.allocate()
+    allocator.check_capacity(9)
+    with pytest.raises(ValueError, match="only 9 are left"):
+        allocator.check_capacity(10)
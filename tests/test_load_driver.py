@@ -0,0 +1,17 @@
+import random
+from load_driver import Workload
+
+def test_session_skew_follows_the_customer_ranking():
+    sessions = [("R" + str(customer).zfill(4), "token" + str(session)) for customer in range(100) for session in range(3)]
+    random.Random(1).shuffle(sessions)
+    workload = Workload([], list(range(10, 0, -1)), [customer for customer, _ in sessions], [1, 2], sessions, seed=7, key_distributions={ "session_customers": "hot:3:0.99" })
+
+    picks = [workload.session()[0] for _ in range(1000)]
+    assert sum(customer == "R0000" for customer in picks) > 900
+
+def test_same_seed_picks_the_same_values():
+    def picks(seed):
+        workload = Workload([5, 6], [3, 1, 2], ["R1", "R2"], [1, 2, 3], [("R1", "t")], seed=seed)
+        return [workload.two_open_accounts() for _ in range(20)], [workload.currency() for _ in range(20)], workload.account_to_open()
+
+    assert picks(3) == picks(3)
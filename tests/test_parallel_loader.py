@@ -0,0 +1,65 @@
+import threading
+import pytest
+from parallel_loader import run_schedule, waves
+
+def manifest(*tables):
+    # tables are (name, bytes, names it depends on)
+    return { "format": "tsv", "tables": [{ "table": name, "file": name + ".tsv", "bytes": size, "depends_on": parents } for name, size, parents in tables] }
+
+BANK = manifest(
+    ("currency_list", 10, []),
+    ("account", 100, ["currency_list"]),
+    ("bargain", 1000, ["currency_list"]),
+    ("local_bargain", 500, ["bargain", "account"]),
+    ("incoming_bargain", 50, ["local_bargain"]),
+    ("stock", 5, []),
+)
+
+class Recorder:
+    def __init__(self, failing=()):
+        self.lock = threading.Lock()
+        self.started = []
+        self.finished = []
+        self.failing = failing
+
+    def load(self, table):
+        with self.lock:
+            self.started.append(table["table"])
+        if table["table"] in self.failing:
+            raise RuntimeError("cannot load " + table["table"])
+        with self.lock:
+            self.finished.append(table["table"])
+
+def test_tables_start_after_their_dependencies():
+    for workers in [1, 3]:
+        recorder = Recorder()
+        run_schedule(BANK, recorder.load, workers)
+
+        assert sorted(recorder.finished) == sorted(table["table"] for table in BANK["tables"])
+        for table in BANK["tables"]:
+            for parent in table["depends_on"]:
+                assert recorder.finished.index(parent) < recorder.started.index(table["table"])
+
+def test_longest_waiting_chain_starts_first():
+    recorder = Recorder()
+    run_schedule(BANK, recorder.load, 1)
+    # bargain has 1550 bytes waiting behind it, account 650, stock 5
+    assert recorder.started[:4] == ["currency_list", "bargain", "account", "local_bargain"]
+    assert recorder.started[-1] == "stock"
+
+def test_failure_stops_the_tables_depending_on_it():
+    recorder = Recorder(failing=["bargain"])
+    with pytest.raises(RuntimeError, match="cannot load bargain"):
+        run_schedule(BANK, recorder.load, 1)
+    assert "local_bargain" not in recorder.started
+    assert "incoming_bargain" not in recorder.started
+
+def test_waves():
+    assert waves(BANK) == [["currency_list", "stock"], ["account", "bargain"], ["local_bargain"], ["incoming_bargain"]]
+
+def test_cycles_are_refused():
+    cycle = manifest(("a", 1, ["b"]), ("b", 1, ["a"]))
+    with pytest.raises(ValueError, match="cycle"):
+        waves(cycle)
+    with pytest.raises(ValueError, match="cycle"):
+        run_schedule(cycle, Recorder().load, 2)
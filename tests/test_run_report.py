@@ -0,0 +1,45 @@
+import tracemalloc
+import pytest
+from records import BankInformation
+from run_report import StageMonitor
+from sql_file_generator import GeneratorConfig
+
+@pytest.fixture
+def traced():
+    tracing = tracemalloc.is_tracing()
+    yield
+    if not tracing:
+        tracemalloc.stop()
+
+def run_stage(monitor, name, stage):
+    return sum(1 for _ in monitor.watch(name, stage()))
+
+def test_small_stage_reports_small_peak(traced):
+    monitor = StageMonitor(GeneratorConfig(trace_memory=True), "shard_0")
+    # Memory held from before the stage, like the open spools and earlier stages
+    held = bytearray(32 * 2**20)
+
+    def small_stage():
+        for bank_ID in range(10):
+            yield BankInformation(bank_ID, "000000", "SWIFT")
+
+    assert run_stage(monitor, "small_stage", small_stage) == 10
+    assert monitor.stages[0]["peak_memory_mb"] < 1
+    del held
+
+def test_stage_peak_counts_what_the_stage_allocates(traced):
+    monitor = StageMonitor(GeneratorConfig(trace_memory=True), "shard_0")
+
+    def allocating_stage():
+        block = bytearray(16 * 2**20)
+        yield BankInformation(1, "000000", "SWIFT")
+        del block
+
+    run_stage(monitor, "allocating_stage", allocating_stage)
+    assert 16 <= monitor.stages[0]["peak_memory_mb"] < 17
+
+def test_stage_rows_are_counted_by_table():
+    monitor = StageMonitor(GeneratorConfig(), "shard_0")
+    run_stage(monitor, "banks", lambda: (BankInformation(bank_ID, "000000", "SWIFT") for bank_ID in range(3)))
+    assert monitor.stages[0]["rows"] == { "bank_information": 3 }
+    assert "peak_memory_mb" not in monitor.stages[0]
@@ -0,0 +1,67 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from sql_file_generator import GeneratorConfig, generate_delta, main, read_high_water_marks
+
+SMALL = ["--seed", "3", "--customers", "200", "--customers-per-shard", "50"]
+
+def generate(directory, name, *arguments):
+    output = str(directory / name)
+    main(SMALL + ["--output", output] + list(arguments))
+    return output
+
+def bargains(path):
+    # bargain_ID, amount, currency_ID, bargain_status, bargain_date of a tsv bargain file
+    with open(path, encoding="utf-8") as bargain_file:
+        return [(int(row[0]), row[3], datetime.fromisoformat(row[4])) for row in csv.reader(bargain_file, delimiter="\t")]
+
+def test_same_seed_gives_the_same_output_with_any_number_of_processes(tmp_path):
+    outputs = [generate(tmp_path, "processes_" + str(processes) + ".sql", "--processes", str(processes)) for processes in [1, 2, 3]]
+    texts = [open(output, 'rb').read() for output in outputs]
+    assert texts[0] == texts[1] == texts[2]
+
+    marks = [json.load(open(output + ".marks.json")) for output in outputs]
+    assert marks[0] == marks[1] == marks[2]
+
+def test_delta_continues_from_the_marks(tmp_path):
+    output = generate(tmp_path, "full.sql")
+    marks = json.load(open(output + ".marks.json"))
+
+    (tmp_path / "first").mkdir()
+    first = str(tmp_path / "first" / "delta.tsv")
+    main(["--seed", "5", "--format", "tsv", "--delta-days", "2", "--bargains-per-day", "30", "--marks", output + ".marks.json", "--output", first])
+    first_bargains = bargains(tmp_path / "first" / "bargain.tsv")
+    assert [bargain_ID for bargain_ID, _, _ in first_bargains] == list(range(marks["bargain_ID"] + 1, marks["bargain_ID"] + 61))
+
+    first_marks = json.load(open(first + ".marks.json"))
+    assert first_marks["bargain_ID"] == marks["bargain_ID"] + 60
+    assert first_marks["account_number"] == marks["account_number"]
+
+    (tmp_path / "second").mkdir()
+    main(["--seed", "6", "--format", "tsv", "--delta-days", "1", "--bargains-per-day", "30", "--marks", first + ".marks.json", "--output", str(tmp_path / "second" / "delta.tsv")])
+    second_bargains = bargains(tmp_path / "second" / "bargain.tsv")
+    assert [bargain_ID for bargain_ID, _, _ in second_bargains] == list(range(first_marks["bargain_ID"] + 1, first_marks["bargain_ID"] + 31))
+
+def test_delta_bargains_after_now_wait_for_their_date(tmp_path):
+    output = generate(tmp_path, "full.sql")
+    marks = read_high_water_marks(output + ".marks.json")
+    # The delta is made in the middle of its window
+    now = datetime.combine(marks.todays_date + timedelta(days=2), time(12))
+
+    (tmp_path / "delta").mkdir()
+    config = GeneratorConfig(master_seed=5, output_format="tsv", bargains_per_day=200, output_file_name=str(tmp_path / "delta" / "delta.tsv"))
+    generate_delta(config, marks, 3, now=now)
+
+    delta_bargains = bargains(tmp_path / "delta" / "bargain.tsv")
+    assert not [bargain for bargain in delta_bargains if bargain[1] == "Succesful" and bargain[2] > now]
+    assert "Succesful" in [status for _, status, _ in delta_bargains]
+    assert {status for _, status, date in delta_bargains if date > now} == {"Waiting for Date"}
+
+def test_snapshot_is_written_again_byte_for_byte(tmp_path):
+    direct = generate(tmp_path, "direct.sql")
+    snapshot = generate(tmp_path, "dataset.snapshot", "--format", "snapshot")
+    emitted = str(tmp_path / "emitted.sql")
+    main(["--from-snapshot", snapshot, "--output", emitted])
+
+    assert open(emitted, 'rb').read() == open(direct, 'rb').read()
+    assert json.load(open(emitted + ".marks.json")) == json.load(open(direct + ".marks.json"))
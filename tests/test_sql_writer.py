@@ -0,0 +1,68 @@
+import io
+from datetime import date, datetime
+import pytest
+from records import BankInformation
+from sql_writer import DelimitedWriter, InsertWriter, SQLExpression, TimeFromNow
+
+def test_insert_statements_hold_batch_size_rows():
+    file = io.StringIO()
+    writer = InsertWriter(file, BankInformation, batch_size=2)
+    for bank_ID in range(5):
+        writer.write(BankInformation(bank_ID, "000000", "SWIFT"))
+    writer.close()
+
+    statements = file.getvalue().split(";\n\n")[:-1]
+    assert len(statements) == writer.statements == 3
+    assert [statement.count("\n(") for statement in statements] == [2, 2, 1]
+    assert statements[0].startswith("INSERT INTO `bank_information` (`bank_ID`, `sort_code`, `SWIFT`) VALUES\n")
+
+def test_insert_values_are_escaped():
+    file = io.StringIO()
+    writer = InsertWriter(file, BankInformation, use_transactions=True)
+    writer.write(BankInformation(1, 'say "hi"', "back\\slash"))
+    writer.write(BankInformation(2, None, SQLExpression("CURRENT_DATE()")))
+    writer.close()
+
+    assert file.getvalue() == (
+        "START TRANSACTION;\n"
+        "INSERT INTO `bank_information` (`bank_ID`, `sort_code`, `SWIFT`) VALUES\n"
+        '(1, "say \\"hi\\"", "back\\\\slash"),\n'
+        "(2, NULL, CURRENT_DATE());\n\n"
+        "COMMIT;\n\n"
+    )
+
+def test_insert_time_from_now_is_relative_to_the_load():
+    file = io.StringIO()
+    writer = InsertWriter(file, BankInformation)
+    writer.write(BankInformation(1, TimeFromNow(hours=1), date(2024, 2, 29)))
+    writer.close()
+    assert '(1, DATE_ADD(NOW(), INTERVAL 3600 SECOND), "2024-02-29")' in file.getvalue()
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        InsertWriter(io.StringIO(), BankInformation, batch_size=0)
+    with pytest.raises(ValueError):
+        DelimitedWriter(io.StringIO(), BankInformation, file_format="xml")
+
+@pytest.mark.parametrize("file_format, line", [
+    ("tsv", "1\t\\N\ttab\\there\\nand line\t3600\t2024-02-29 10:00:00\t1"),
+    ("csv", '1,\\N,"tab\there\\nand line",3600,2024-02-29 10:00:00,1'),
+])
+def test_delimited_null_escapes_and_time_from_now(file_format, line):
+    file = io.StringIO()
+    writer = DelimitedWriter(file, tuple, batch_size=1, file_format=file_format)
+    writer.write((1, None, "tab\there\nand line", TimeFromNow(hours=1), datetime(2024, 2, 29, 10), True))
+    writer.close()
+    assert file.getvalue() == line + "\n"
+
+def test_delimited_quotes_in_csv():
+    file = io.StringIO()
+    writer = DelimitedWriter(file, tuple, file_format="csv")
+    writer.write(('say "hi"', "back\\slash"))
+    writer.close()
+    assert file.getvalue() == '"say \\"hi\\"","back\\\\slash"\n'
+
+def test_delimited_files_cannot_hold_sql_expressions():
+    writer = DelimitedWriter(io.StringIO(), tuple)
+    with pytest.raises(ValueError):
+        writer.write((SQLExpression("NOW()"),))